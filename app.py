@@ -1,17 +1,45 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 import requests
+import base64
 import json
 from datetime import datetime, timedelta, timezone
 import os
 import re
-from textblob import TextBlob
+import time
 import logging
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from jinja2.exceptions import TemplateNotFound
 from dotenv import load_dotenv
+from services.comment_processor import score_texts
+from services.comment_store import CommentStore
+from services.comment_table import SORT_FIELDS, SORT_KEY_TYPES, CommentView, to_comment_table, to_comment_view
+from services.http_client import YOUTUBE_API_BASE_URL, get_upstream_client
+from services.ingestion import MultiChannelIngestor
+from services.metrics import HTTP_REQUEST_SECONDS, KEY_ROTATIONS, QUOTA_ERRORS, UPSTREAM_CALLS, render_metrics
+from services.profiling import PROFILE_HEADER, PROFILE_TOKENS, end_profile, parse_profile_header, span, start_profile
+from services.quota import QUOTA_COSTS, QuotaScheduler, quota_error_kind
+from services.refresher import SnapshotRefresher
+from services.response_cache import ENCODINGS, CompressedResponseCache, make_etag
+from services.rollups import GRANULARITIES, SentBuckets, SentimentRollup, aggregate
+from services.single_flight import SingleFlight
+from services.sentiment_cache import sentiment_memo
+from services.snapshot_cache import SnapshotCache
 
 load_dotenv()
 
+class CommentJSONProvider(DefaultJSONProvider):
+    """JSON provider that materializes comment table views when serializing"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, CommentView):
+            return o.to_list()
+        return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
+app.json = CommentJSONProvider(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,174 +51,639 @@ YOUTUBE_API_KEY_1 = os.getenv("")  # Replace with your first valid API key
 YOUTUBE_API_KEY_2 = os.getenv("API_KEY_2")  # Replace with your second valid API key
 CHANNEL_ID = "UCB-mfYAd3oJLEkoMxjRAxbg"
 
+# Snapshot cache configuration (seconds / number of entries)
+SNAPSHOT_CACHE_TTL = int(os.getenv("SNAPSHOT_CACHE_TTL", "300"))
+SNAPSHOT_CACHE_MAX_ENTRIES = int(os.getenv("SNAPSHOT_CACHE_MAX_ENTRIES", "8"))
+
+# Number of videos whose comments are fetched in parallel (1 fetches sequentially)
+FETCH_WORKERS = max(int(os.getenv("FETCH_WORKERS", "8")), 1)
+
+# SQLite file for the incremental comment store (empty to disable)
+COMMENT_STORE_PATH = os.getenv("COMMENT_STORE_PATH", "comments.db")
+
+# Skip comment fetches for videos whose commentCount has not changed
+CHANGE_DETECTION = os.getenv("CHANGE_DETECTION", "1") == "1"
+
+# Background refresh of the largest snapshot the routes can ask for
+BACKGROUND_REFRESH = os.getenv("BACKGROUND_REFRESH", "1") == "1"
+REFRESH_INTERVAL = int(os.getenv("REFRESH_INTERVAL", "300"))
+REFRESH_MAX_VIDEOS = int(os.getenv("REFRESH_MAX_VIDEOS", "20"))
+REFRESH_MAX_COMMENTS = int(os.getenv("REFRESH_MAX_COMMENTS", "100"))
+# Seconds a request waits for the first background build before fetching on its own
+REFRESH_FIRST_WAIT = float(os.getenv("REFRESH_FIRST_WAIT", "2"))
+
+# Additional channels crawled by the asyncio ingestor (comma-separated ids),
+# selectable on the API routes with ?channel=<id>
+CHANNEL_IDS = [channel.strip() for channel in os.getenv("CHANNEL_IDS", "").split(",") if channel.strip() and channel.strip() != CHANNEL_ID]
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_CHANNEL_WORKERS = int(os.getenv("INGEST_CHANNEL_WORKERS", "4"))
+INGEST_CALLS_PER_SECOND = float(os.getenv("INGEST_CALLS_PER_SECOND", "5"))
+INGEST_INTERVAL = int(os.getenv("INGEST_INTERVAL", "900"))
+
+class CommentFetchFailed(Exception):
+    """A video's comments could not be fetched completely; `comments` holds the best known ones"""
+    
+    def __init__(self, video_id, comments):
+        super().__init__(f"Could not fetch comments for video {video_id}")
+        self.comments = comments
+
 class YouTubeCommentsService:
     def __init__(self):
         self.api_keys = [YOUTUBE_API_KEY_1, YOUTUBE_API_KEY_2]
         self.channel_id = CHANNEL_ID
-        self.current_api_key_index = 0
+        self.quota = QuotaScheduler(self.api_keys)
+        self._uploads_playlist_id = None
+        self._comment_counts = {}
+        self.fetch_workers = FETCH_WORKERS
+        self.http = get_upstream_client()
+        self.comment_store = CommentStore(COMMENT_STORE_PATH) if COMMENT_STORE_PATH else None
+        self.single_flight = SingleFlight()
+        self.rollups = SentimentRollup()
+        self.snapshot_cache = SnapshotCache(ttl=SNAPSHOT_CACHE_TTL, max_entries=SNAPSHOT_CACHE_MAX_ENTRIES)
+        self.refresher = SnapshotRefresher(self._refresh_snapshot, interval=REFRESH_INTERVAL) if BACKGROUND_REFRESH else None
     
     def get_current_api_key(self):
-        """Get the current API key"""
-        return self.api_keys[self.current_api_key_index]
+        """Get the API key with the most remaining quota today"""
+        return self.quota.pick_key()
+    
+    def switch_api_key(self, failed_key=None, error=None):
+        """Put a key that ran out of quota in cooldown and switch to the next best key.
+        
+        Keys out of daily quota cool down until the reset; keys that were only rate
+        limited cool down for a few seconds. Concurrent failures of the same key only
+        put it in cooldown once; every caller then picks the key with the most
+        remaining budget.
+        """
+        if failed_key is not None:
+            rate_limited = error is not None and self._is_rate_limit_error(error)
+            QUOTA_ERRORS.labels(self.quota.key_label(failed_key), 'rate_limit' if rate_limited else 'quota').inc()
+            if rate_limited:
+                self.quota.mark_throttled(failed_key)
+            else:
+                self.quota.mark_exhausted(failed_key)
+        key = self.quota.pick_key()
+        if key is not None:
+            if failed_key is not None and key != failed_key:
+                KEY_ROTATIONS.inc()
+            logger.info(f"Switched to API {self.quota.key_label(key)}")
+        return key
     
-    def switch_api_key(self):
-        """Switch to the next API key if rate limit or error occurs"""
-        self.current_api_key_index = (self.current_api_key_index + 1) % len(self.api_keys)
-        logger.info(f"Switched to API key {self.current_api_key_index + 1}")
-        return self.get_current_api_key()
+    def _clean_text(self, text):
+        """Strip HTML tags, URLs and special characters before scoring"""
+        cleaned_text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
+        cleaned_text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', cleaned_text)  # Remove URLs
+        cleaned_text = re.sub(r'[^\w\s]', '', cleaned_text)  # Remove special characters
+        return cleaned_text
     
     def analyze_sentiment(self, text):
-        """Analyze sentiment of text using TextBlob"""
+        """Analyze sentiment of text using the TextBlob-compatible lexicon engine"""
+        return self.analyze_sentiment_batch([text])[0]
+    
+    def analyze_sentiment_batch(self, texts):
+        """Analyze sentiment labels of many texts in one batch"""
+        return [label for _, label in self.score_sentiment_batch(texts)]
+    
+    def score_sentiment_batch(self, texts):
+        """Get (polarity, label) for many texts in one batch, memoized by cleaned text"""
         try:
-            # Clean the text
-            cleaned_text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
-            cleaned_text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', cleaned_text)  # Remove URLs
-            cleaned_text = re.sub(r'[^\w\s]', '', cleaned_text)  # Remove special characters
-            
-            if not cleaned_text.strip():
-                return 'neutral'
-            
-            blob = TextBlob(cleaned_text)
-            polarity = blob.sentiment.polarity
-            
-            if polarity > 0.1:
-                return 'positive'
-            elif polarity < -0.1:
-                return 'negative'
-            else:
-                return 'neutral'
+            cleaned_texts = [self._clean_text(text) for text in texts]
+            scorable = [i for i, cleaned_text in enumerate(cleaned_texts) if cleaned_text.strip()]
+            results = [(0.0, 'neutral')] * len(texts)
+            scores = score_texts([cleaned_texts[i] for i in scorable])
+            for i, (polarity, _, label) in zip(scorable, scores):
+                results[i] = (round(polarity, 4), label)
+            return results
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {e}")
-            return 'neutral'
+            return [(0.0, 'neutral')] * len(texts)
     
-    def get_latest_videos(self, max_results=50):
-        """Get latest videos from the YouTube channel"""
-        url = "https://www.googleapis.com/youtube/v3/search"
-        published_after = (datetime.now(timezone.utc) - timedelta(days=30)).replace(microsecond=0).isoformat()
-        params = {
-            'key': self.get_current_api_key(),
-            'channelId': self.channel_id,
-            'part': 'snippet,id',
-            'order': 'date',
-            'maxResults': min(max_results, 50),  # YouTube API limit
-            'type': 'video',
-            'publishedAfter': published_after
-        }
+    def _is_quota_error(self, error):
+        """Check whether a YouTube API error means the key is out of quota"""
+        return quota_error_kind(error) is not None
+    
+    def _is_rate_limit_error(self, error):
+        """Check whether a quota error is only a short-term rate limit, not daily exhaustion"""
+        return quota_error_kind(error) == 'rate_limit'
+    
+    def _get_json(self, url, params, description):
+        """GET a YouTube API endpoint with the key that has the most quota left.
         
-        for attempt in range(len(self.api_keys)):
+        Each call is charged to its key; keys that hit a quota error are put in cooldown
+        and the call is retried with the next best key. Returns the decoded response, or
+        None when the request failed or no key has quota left.
+        """
+        endpoint = url.rsplit('/', 1)[-1]
+        cost = QUOTA_COSTS.get(endpoint, 1)
+        for attempt in range(max(len(self.quota.api_keys), 1)):
+            key = self.quota.pick_key(cost)
+            if key is None:
+                logger.error(f"No API key has {cost} quota units left and is not rate limited to fetch {description}")
+                return None
+            params['key'] = key
+            
             try:
-                logger.info(f"Fetching videos with params: {params}")
-                response = requests.get(url, params=params, timeout=30)
+                logged_params = {name: value for name, value in params.items() if name != 'key'}
+                logger.info(f"Fetching {description} with API {self.quota.key_label(key)} and params: {logged_params}")
+                response = self.http.get(url, params=params, timeout=30, key_label=self.quota.key_label(key))
+                outcome = 'cached' if response.from_cache else str(response.status_code)
+                UPSTREAM_CALLS.labels(endpoint, self.quota.key_label(key), outcome).inc()
+                if not response.from_cache:
+                    self.quota.charge(key, cost)
                 response.raise_for_status()
                 data = response.json()
                 
                 if 'error' in data:
-                    logger.error(f"YouTube API error: {data['error']}")
-                    if data['error'].get('code') == 403:
-                        params['key'] = self.switch_api_key()
+                    logger.error(f"YouTube API error for {description}: {data['error']}")
+                    if data['error'].get('code') == 403 and self._is_quota_error(data['error']):
+                        self.switch_api_key(key, data['error'])
                         continue
                     else:
                         raise Exception(data['error']['message'])
                 
-                videos = []
-                for item in data.get('items', []):
-                    if 'videoId' in item.get('id', {}):
-                        videos.append({
-                            'videoId': item['id']['videoId'],
-                            'title': item['snippet']['title'],
-                            'publishedAt': item['snippet']['publishedAt'],
-                            'description': item['snippet'].get('description', '')[:200],
-                            'thumbnail': item['snippet']['thumbnails'].get('default', {}).get('url', '')
-                        })
-                
-                logger.info(f"Retrieved {len(videos)} videos")
-                return videos
+                return data
                 
             except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching videos (attempt {attempt + 1}): {e}")
+                if getattr(e, 'response', None) is None:
+                    UPSTREAM_CALLS.labels(endpoint, self.quota.key_label(key), 'connection_error').inc()
+                logger.error(f"Error fetching {description} (attempt {attempt + 1}): {e}")
                 if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 403:
-                    params['key'] = self.switch_api_key()
-                    continue
-                return []
+                    try:
+                        error = e.response.json().get('error', {})
+                    except ValueError:
+                        error = {}
+                    if self._is_quota_error(error):
+                        self.switch_api_key(key, error)
+                        continue
+                return None
             except Exception as e:
-                logger.error(f"Unexpected error fetching videos: {e}")
-                return []
+                logger.error(f"Unexpected error fetching {description}: {e}")
+                return None
         
-        logger.error("All API keys failed to fetch videos")
-        return []
+        logger.error(f"All API keys failed to fetch {description}")
+        return None
+    
+    def get_latest_videos(self, max_results=50):
+        """Get latest videos from the YouTube channel, sharing one fetch among concurrent callers"""
+        return self.single_flight.do(('videos', self.channel_id, max_results), self._fetch_latest_videos, max_results)
+    
+    def get_uploads_playlist_id(self):
+        """Get the channel's uploads playlist id, resolved once via channels.list"""
+        if self._uploads_playlist_id is None:
+            url = f"{YOUTUBE_API_BASE_URL}/channels"
+            params = {
+                'key': self.get_current_api_key(),
+                'id': self.channel_id,
+                'part': 'contentDetails'
+            }
+            data = self._get_json(url, params, f"uploads playlist for channel {self.channel_id}")
+            items = (data or {}).get('items', [])
+            if items:
+                self._uploads_playlist_id = items[0]['contentDetails']['relatedPlaylists']['uploads']
+            else:
+                # Fall back to the documented naming convention (UC... -> UU...)
+                logger.warning(f"Could not resolve uploads playlist for channel {self.channel_id}; deriving it")
+                return 'UU' + self.channel_id[2:]
+        return self._uploads_playlist_id
+    
+    def _fetch_latest_videos(self, max_results=50):
+        """Fetch videos from the last 30 days by paging the channel's uploads playlist.
+        
+        playlistItems.list costs 1 quota unit per page against 100 for search.list;
+        paging stops at the first video older than the cutoff.
+        """
+        url = f"{YOUTUBE_API_BASE_URL}/playlistItems"
+        published_after = (datetime.now(timezone.utc) - timedelta(days=30)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        params = {
+            'key': self.get_current_api_key(),
+            'playlistId': self.get_uploads_playlist_id(),
+            'part': 'snippet,contentDetails',
+            'maxResults': min(max_results, 50)  # YouTube API limit per page
+        }
+        
+        videos = []
+        while len(videos) < max_results:
+            data = self._get_json(url, params, "videos")
+            if data is None:
+                break
+            
+            reached_cutoff = False
+            for item in data.get('items', []):
+                published_at = item.get('contentDetails', {}).get('videoPublishedAt')
+                if not published_at:  # Private or deleted video
+                    continue
+                if published_at < published_after:
+                    reached_cutoff = True
+                    break
+                videos.append({
+                    'videoId': item['contentDetails']['videoId'],
+                    'title': item['snippet']['title'],
+                    'publishedAt': published_at,
+                    'description': item['snippet'].get('description', '')[:200],
+                    'thumbnail': item['snippet'].get('thumbnails', {}).get('default', {}).get('url', '')
+                })
+            
+            if reached_cutoff or not data.get('nextPageToken'):
+                break
+            params['pageToken'] = data['nextPageToken']
+        
+        # Uploads are listed newest first, but scheduled premieres can be out of order
+        videos.sort(key=lambda video: video['publishedAt'], reverse=True)
+        logger.info(f"Retrieved {len(videos)} videos")
+        return videos[:max_results]
+    
+    def get_comment_counts(self, video_ids):
+        """Get statistics.commentCount per video, batching 50 ids per videos.list call.
+        
+        Videos with comments disabled report 0; videos missing from the response are left out.
+        """
+        url = f"{YOUTUBE_API_BASE_URL}/videos"
+        counts = {}
+        for start in range(0, len(video_ids), 50):
+            params = {
+                'key': self.get_current_api_key(),
+                'part': 'statistics',
+                'id': ','.join(video_ids[start:start + 50])
+            }
+            data = self._get_json(url, params, "comment counts")
+            for item in (data or {}).get('items', []):
+                counts[item['id']] = int(item.get('statistics', {}).get('commentCount', 0))
+        return counts
+    
+    def _unchanged_comments(self, video_id, max_results, comment_count):
+        """Get known comments of a video whose commentCount has not changed, or None to fetch"""
+        if comment_count is None:
+            return None
+        if comment_count == 0:
+            return []
+        
+        if self.comment_store is not None:
+            state = self.comment_store.get_video_state(video_id)
+            if (state and state['comment_count'] == comment_count
+                    and (state['complete'] or state['count'] >= max_results)):
+                return self.comment_store.get_comments(video_id, max_results)
+            return None
+        
+        if self._comment_counts.get(video_id) == comment_count:
+            return self.snapshot_cache.get_video_comments(video_id, max_results)
+        return None
+    
+    def _record_comment_count(self, video_id, comment_count):
+        if self.comment_store is not None:
+            self.comment_store.set_comment_count(video_id, comment_count)
+        else:
+            self._comment_counts[video_id] = comment_count
     
     def get_comments_for_video(self, video_id, max_results=50):
-        """Get comments for a specific video"""
-        url = "https://www.googleapis.com/youtube/v3/commentThreads"
+        """Get comments for a specific video, served from the snapshot cache when possible"""
+        comments = self.snapshot_cache.get_video_comments(video_id, max_results)
+        if comments is not None:
+            return comments
+        
+        try:
+            comments = self._fetch_comments_for_video(video_id, max_results)
+        except CommentFetchFailed as e:
+            return e.comments
+        if comments:
+            self.snapshot_cache.put_video_comments(video_id, max_results, comments)
+        return comments
+    
+    def _fetch_comments_for_video(self, video_id, max_results=50):
+        """Fetch and score comments for a specific video, sharing one fetch among concurrent callers"""
+        return self.single_flight.do(('comments', video_id, max_results), self._load_comments_for_video, video_id, max_results)
+    
+    def _load_comments_for_video(self, video_id, max_results=50):
+        """Fetch and score comments for a specific video from the API.
+        
+        Raises CommentFetchFailed when the API failed before the comments were all fetched.
+        """
+        if self.comment_store is not None:
+            return self._refresh_stored_comments(video_id, max_results)
+        
+        outcome = {}
+        comments = list(self.iter_video_comments(video_id, limit=max_results, outcome=outcome))
+        if outcome['ended'] == 'error':
+            raise CommentFetchFailed(video_id, comments)
+        logger.info(f"Retrieved {len(comments)} comments for video {video_id}")
+        return comments
+    
+    def _refresh_stored_comments(self, video_id, max_results):
+        """Fetch only comments newer than the stored high-water mark, then read from the store.
+        
+        Nothing is stored when the fetch fails part way, as a partial incremental fetch
+        would move the high-water mark past comments that were never seen.
+        """
+        state = self.comment_store.get_video_state(video_id)
+        outcome = {}
+        
+        if state is None or (not state['complete'] and state['count'] < max_results) or not state['newest_seen']:
+            # Not stored deeply enough yet: backfill, reusing sentiment of comments already stored
+            known_sentiments = self.comment_store.get_sentiments(video_id) if state else None
+            comments = list(self.iter_video_comments(video_id, limit=max_results, known_sentiments=known_sentiments, outcome=outcome))
+            if outcome['ended'] != 'error':
+                # Complete only if the last page of the thread was reached
+                self.comment_store.save_comments(video_id, comments, complete=outcome['ended'] == 'end')
+        else:
+            comments = list(self.iter_video_comments(video_id, published_after=state['newest_seen'], outcome=outcome))
+            if outcome['ended'] != 'error':
+                self.comment_store.save_comments(video_id, comments)
+        
+        if outcome['ended'] == 'error':
+            logger.error(f"Fetching comments for video {video_id} failed after {len(comments)} comments; nothing stored")
+            raise CommentFetchFailed(video_id, self.comment_store.get_comments(video_id, max_results) if state else [])
+        
+        logger.info(f"Retrieved {len(comments)} new comments for video {video_id}")
+        return self.comment_store.get_comments(video_id, max_results)
+    
+    def iter_video_comments(self, video_id, limit=None, published_after=None, time_budget=None, known_sentiments=None,
+                            outcome=None):
+        """Yield scored comments for a video, newest first, one page at a time.
+        
+        Follows nextPageToken lazily and stops after `limit` comments, at the first
+        comment published at or before `published_after` (an ISO 8601 timestamp
+        as returned by the API), or once `time_budget` seconds have elapsed.
+        Comments found in `known_sentiments` (comment id -> (label, polarity)) are not scored again.
+        When given, `outcome['ended']` is set to why it stopped: 'end' (last page),
+        'limit', 'cutoff', 'budget' or 'error'.
+        """
+        outcome = {} if outcome is None else outcome
+        outcome['ended'] = None
+        url = f"{YOUTUBE_API_BASE_URL}/commentThreads"
         params = {
             'key': self.get_current_api_key(),
             'part': 'snippet',
             'videoId': video_id,
-            'maxResults': min(max_results, 100),  # YouTube API limit
+            'maxResults': min(limit, 100) if limit else 100,  # YouTube API limit per page
             'order': 'time'
         }
+        deadline = time.monotonic() + time_budget if time_budget else None
+        yielded = 0
         
-        for attempt in range(len(self.api_keys)):
-            try:
-                logger.info(f"Fetching comments for video {video_id} with params: {params}")
-                response = requests.get(url, params=params, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                if 'error' in data:
-                    logger.error(f"YouTube API error for video {video_id}: {data['error']}")
-                    if data['error'].get('code') == 403:
-                        params['key'] = self.switch_api_key()
-                        continue
-                    else:
-                        raise Exception(data['error']['message'])
-                
-                comments = []
-                for item in data.get('items', []):
-                    try:
-                        comment_data = item['snippet']['topLevelComment']['snippet']
-                        comment_text = comment_data['textDisplay']
-                        sentiment = self.analyze_sentiment(comment_text)
-                        
-                        comments.append({
-                            'author': comment_data['authorDisplayName'],
-                            'comment': comment_text[:500],  # Limit comment length
-                            'date': comment_data['publishedAt'],
-                            'likeCount': comment_data.get('likeCount', 0),
-                            'sentiment': sentiment,
-                            'authorProfileImageUrl': comment_data.get('authorProfileImageUrl', '')
-                        })
-                    except KeyError as e:
-                        logger.warning(f"Missing key in comment data: {e}")
-                        continue
-                
-                logger.info(f"Retrieved {len(comments)} comments for video {video_id}")
-                return comments
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching comments for video {video_id} (attempt {attempt + 1}): {e}")
-                if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 403:
-                    params['key'] = self.switch_api_key()
+        while True:
+            data = self._get_json(url, params, f"comments for video {video_id}")
+            if data is None:
+                outcome['ended'] = 'error'
+                return
+            
+            page = []
+            reached_cutoff = False
+            for item in data.get('items', []):
+                try:
+                    comment_id = item['snippet']['topLevelComment'].get('id', item.get('id'))
+                    comment_data = item['snippet']['topLevelComment']['snippet']
+                    comment_text = comment_data['textDisplay']
+                    
+                    if published_after and comment_data['publishedAt'] <= published_after:
+                        reached_cutoff = True
+                        break
+                    
+                    sentiment, polarity = (known_sentiments or {}).get(comment_id, (None, None))
+                    page.append((comment_text, {
+                        'id': comment_id,
+                        'author': comment_data['authorDisplayName'],
+                        'comment': comment_text[:500],  # Limit comment length
+                        'date': comment_data['publishedAt'],
+                        'likeCount': comment_data.get('likeCount', 0),
+                        'sentiment': sentiment,
+                        'polarity': polarity,
+                        'authorProfileImageUrl': comment_data.get('authorProfileImageUrl', '')
+                    }))
+                except KeyError as e:
+                    logger.warning(f"Missing key in comment data: {e}")
                     continue
-                return []
-            except Exception as e:
-                logger.error(f"Unexpected error fetching comments for video {video_id}: {e}")
-                return []
-        
-        logger.error(f"All API keys failed to fetch comments for video {video_id}")
-        return []
+            
+            # Score the whole page in one batch, skipping comments with known sentiment
+            unscored = [comment for _, comment in page if comment['sentiment'] is None]
+            scores = self.score_sentiment_batch([text for text, comment in page if comment['sentiment'] is None])
+            for comment, (polarity, label) in zip(unscored, scores):
+                comment['sentiment'] = label
+                comment['polarity'] = polarity
+            
+            for _, comment in page:
+                yield comment
+                yielded += 1
+                if limit and yielded >= limit:
+                    outcome['ended'] = 'limit'
+                    return
+            if reached_cutoff:
+                outcome['ended'] = 'cutoff'
+                return
+            
+            next_page_token = data.get('nextPageToken')
+            if not next_page_token:
+                outcome['ended'] = 'end'
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                outcome['ended'] = 'budget'
+                logger.info(f"Time budget exhausted after {yielded} comments for video {video_id}")
+                return
+            
+            params['pageToken'] = next_page_token
+            if limit:
+                params['maxResults'] = min(limit - yielded, 100)
     
+    def iter_export_comments(self, video_ids=None, published_after=None, published_before=None, sentiments=None, max_videos=10):
+        """Yield scored comments for export lazily, newest first per source.
+
+        Read from the comment store when it is enabled; otherwise the videos (the
+        given ones or the latest `max_videos`) are paged through the API one at a time,
+        raising CommentFetchFailed when a video's comments cannot be fetched.
+        """
+        if self.comment_store is not None:
+            yield from self.comment_store.iter_comments(video_ids, published_after, published_before, sentiments)
+            return
+
+        if not video_ids:
+            video_ids = [video['videoId'] for video in self.get_latest_videos(max_videos)[:max_videos]]
+        for video_id in video_ids:
+            outcome = {}
+            for comment in self.iter_video_comments(video_id, published_after=published_after, outcome=outcome):
+                if published_before and comment['date'] > published_before:
+                    continue
+                if sentiments and comment['sentiment'] not in sentiments:
+                    continue
+                yield {
+                    'id': comment['id'],
+                    'video_id': video_id,
+                    'author': comment['author'],
+                    'comment': comment['comment'],
+                    'date': comment['date'],
+                    'likeCount': comment['likeCount'],
+                    'sentiment': comment['sentiment'],
+                    'polarity': comment['polarity']
+                }
+            if outcome['ended'] == 'error':
+                raise CommentFetchFailed(video_id, [])
+
     def get_all_comments_data(self, max_videos=10, max_comments_per_video=50):
-        """Get all comments data for analysis"""
+        """Get all comments data for analysis.
+        
+        Served from the background-refreshed snapshot when the requested sizes fit
+        in it, so the caller never waits on YouTube once the first build is done.
+        Before that the caller waits at most REFRESH_FIRST_WAIT seconds for it and
+        then falls back to the snapshot cache or a fetch of its own.
+        """
         try:
-            videos = self.get_latest_videos(max_videos)
-            all_comments = []
+            snapshot = None
+            if self.refresher is not None and max_videos <= REFRESH_MAX_VIDEOS and max_comments_per_video <= REFRESH_MAX_COMMENTS:
+                snapshot, _ = self.refresher.get(timeout=REFRESH_FIRST_WAIT)
+            
+            if snapshot is None:
+                snapshot = self.snapshot_cache.get_snapshot(max_videos, max_comments_per_video)
+            if snapshot is None:
+                snapshot = self.single_flight.do(
+                    ('snapshot', self.channel_id, max_videos, max_comments_per_video),
+                    self._fetch_and_cache_snapshot, max_videos, max_comments_per_video
+                )
+            
+            data = self._build_comments_data(snapshot, max_videos, max_comments_per_video)
+            data['snapshot_age'] = round(time.time() - snapshot['fetched_ts'], 1)
+            return data
+            
+        except Exception as e:
+            logger.error(f"Error in get_all_comments_data: {e}")
+            return {
+                'total_comments': 0,
+                'video_comment_counts': {},
+                'comments': [],
+                'videos_with_comments': [],
+                'total_videos': 0,
+                'sentiment_counts': {'positive': 0, 'negative': 0, 'neutral': 0},
+                'total_likes': 0,
+                'avg_likes_per_comment': 0,
+                'error': str(e)
+            }
+    
+    def _fetch_and_cache_snapshot(self, max_videos, max_comments_per_video):
+        snapshot = self._fetch_snapshot(max_videos, max_comments_per_video)
+        if snapshot['videos']:
+            self.snapshot_cache.put_snapshot(max_videos, max_comments_per_video, snapshot)
+        return snapshot
+    
+    def _refresh_snapshot(self):
+        """Rebuild the full-size snapshot for the background refresher"""
+        snapshot = self._fetch_snapshot(REFRESH_MAX_VIDEOS, REFRESH_MAX_COMMENTS, use_cache=False)
+        if snapshot['videos']:
+            self.snapshot_cache.put_snapshot(REFRESH_MAX_VIDEOS, REFRESH_MAX_COMMENTS, snapshot)
+        return snapshot
+    
+    def _fetch_snapshot(self, max_videos, max_comments_per_video, use_cache=True):
+        """Fetch the latest videos and their scored comments"""
+        for event, payload in self._iter_fetch_snapshot(max_videos, max_comments_per_video, use_cache):
+            if event == 'snapshot':
+                return payload
+    
+    def _iter_fetch_snapshot(self, max_videos, max_comments_per_video, use_cache=True):
+        """Fetch a snapshot, yielding ('videos', videos) once they are listed, then
+        ('video', (index, video, comments)) as each video completes and finally
+        ('snapshot', snapshot)"""
+        videos = self.get_latest_videos(max_videos)[:max_videos]
+        yield 'videos', videos
+        fetch_comments = self.get_comments_for_video if use_cache else self._fetch_comments_for_video
+        # One videos.list call per 50 videos tells which ones have new comments
+        comment_counts = self.get_comment_counts([video['videoId'] for video in videos]) if CHANGE_DETECTION and videos else {}
+        
+        def fetch(indexed_video):
+            i, video = indexed_video
+            video_id = video['videoId']
+            comment_count = comment_counts.get(video_id)
+            
+            comments = self._unchanged_comments(video_id, max_comments_per_video, comment_count)
+            if comments is not None:
+                logger.info(f"Video {i+1}/{max_videos} unchanged, skipping fetch: {video['title'][:50]}...")
+                return comments
+            
+            logger.info(f"Processing video {i+1}/{max_videos}: {video['title'][:50]}...")
+            try:
+                comments = fetch_comments(video_id, max_comments_per_video)
+            except CommentFetchFailed as e:
+                # Leave the commentCount unrecorded so the next refresh fetches the video again
+                return e.comments
+            if comment_count is not None:
+                self._record_comment_count(video_id, comment_count)
+            return comments
+        
+        results = [None] * len(videos)
+        if self.fetch_workers > 1 and len(videos) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(videos))) as executor:
+                # Each task runs in a copy of the caller's context so a profiled request sees its upstream calls
+                futures = {executor.submit(copy_context().run, fetch, indexed_video): indexed_video[0]
+                           for indexed_video in enumerate(videos)}
+                try:
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        results[i] = future.result()
+                        self.rollups.ingest(videos[i]['videoId'], results[i])
+                        yield 'video', (i, videos[i], results[i])
+                finally:
+                    # A consumer that stops early (e.g. a disconnected stream) abandons queued videos
+                    for future in futures:
+                        future.cancel()
+        else:
+            for i, video in enumerate(videos):
+                results[i] = fetch((i, video))
+                self.rollups.ingest(video['videoId'], results[i])
+                yield 'video', (i, video, results[i])
+        
+        # Results are stored by index, so the snapshot keeps the upload order
+        yield 'snapshot', {
+            'videos': videos,
+            'comments': to_comment_table(videos, {video['videoId']: comments for video, comments in zip(videos, results)}),
+            'fetched_at': datetime.now().isoformat(),
+            'fetched_ts': time.time()
+        }
+    
+    def iter_comments_data(self, max_videos=10, max_comments_per_video=50):
+        """Get comments data progressively.
+        
+        Yields ('videos', videos), then ('video', (index, video, comments)) for
+        every video as soon as its comments are ready, then ('summary', data) with
+        the same data as get_all_comments_data. A ready snapshot is replayed
+        without waiting.
+        """
+        snapshot = None
+        if self.refresher is not None and max_videos <= REFRESH_MAX_VIDEOS and max_comments_per_video <= REFRESH_MAX_COMMENTS:
+            snapshot, _ = self.refresher.get(timeout=0)
+        if snapshot is None:
+            snapshot = self.snapshot_cache.get_snapshot(max_videos, max_comments_per_video)
+        if snapshot is not None:
+            yield from self.replay_snapshot(snapshot, max_videos, max_comments_per_video)
+            return
+        
+        for event, payload in self._iter_fetch_snapshot(max_videos, max_comments_per_video):
+            if event == 'video':
+                i, video, comments = payload
+                yield event, (i, video, comments[:max_comments_per_video])
+            elif event == 'videos':
+                yield event, payload
+            else:
+                snapshot = payload
+                if snapshot['videos']:
+                    self.snapshot_cache.put_snapshot(max_videos, max_comments_per_video, snapshot)
+        
+        data = self._build_comments_data(snapshot, max_videos, max_comments_per_video)
+        data['snapshot_age'] = round(time.time() - snapshot['fetched_ts'], 1)
+        yield 'summary', data
+    
+    def replay_snapshot(self, snapshot, max_videos, max_comments_per_video):
+        """Get the iter_comments_data events of an existing snapshot"""
+        videos = snapshot['videos'][:max_videos]
+        yield 'videos', videos
+        for i, video in enumerate(videos):
+            yield 'video', (i, video, snapshot['comments'].get(video['videoId'], [])[:max_comments_per_video])
+        
+        data = self._build_comments_data(snapshot, max_videos, max_comments_per_video)
+        data['snapshot_age'] = round(time.time() - snapshot['fetched_ts'], 1)
+        yield 'summary', data
+    
+    def _build_comments_data(self, snapshot, max_videos, max_comments_per_video):
+        """Aggregate a (possibly larger) snapshot sliced to the requested sizes"""
+        with span('aggregation'):
+            video_views = []
             video_comment_counts = {}
             videos_with_comments = []
             
-            for i, video in enumerate(videos[:max_videos]):
-                logger.info(f"Processing video {i+1}/{max_videos}: {video['title'][:50]}...")
-                comments = self.get_comments_for_video(video['videoId'], max_comments_per_video)
+            for video in snapshot['videos'][:max_videos]:
+                comments = snapshot['comments'].get(video['videoId'], [])[:max_comments_per_video]
                 
                 if comments:  # Only include videos that have comments
                     video_title_short = video['title'][:30] + ('...' if len(video['title']) > 30 else '')
@@ -202,17 +695,19 @@ class YouTubeCommentsService:
                         'description': video.get('description', ''),
                         'thumbnail': video.get('thumbnail', ''),
                         'comments': comments,
-                        'commentCount': len(comments)
+                        'commentCount': len(comments),
+                        'sentimentCounts': comments.sentiment_counts()
                     })
-                    all_comments.extend(comments)
+                    video_views.append(comments)
+            
+            # Views of the snapshot's comment table; dicts are only built when serialized
+            all_comments = CommentView.concat(video_views)
             
             # Calculate sentiment statistics
-            sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
-            for comment in all_comments:
-                sentiment_counts[comment['sentiment']] += 1
+            sentiment_counts = all_comments.sentiment_counts()
             
             # Calculate engagement metrics
-            total_likes = sum(comment['likeCount'] for comment in all_comments)
+            total_likes = all_comments.total_likes()
             avg_likes_per_comment = total_likes / len(all_comments) if all_comments else 0
             
             logger.info(f"Analysis complete: {len(all_comments)} comments from {len(videos_with_comments)} videos")
@@ -226,25 +721,162 @@ class YouTubeCommentsService:
                 'sentiment_counts': sentiment_counts,
                 'total_likes': total_likes,
                 'avg_likes_per_comment': round(avg_likes_per_comment, 2),
-                'processed_at': datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in get_all_comments_data: {e}")
-            return {
-                'total_comments': 0,
-                'video_comment_counts': {},
-                'comments': [],
-                'videos_with_comments': [],
-                'total_videos': 0,
-                'sentiment_counts': {'positive': 0, 'negative': 0, 'neutral': 0},
-                'total_likes': 0,
-                'avg_likes_per_comment': 0,
-                'error': str(e)
+                'processed_at': snapshot['fetched_at']
             }
 
 # Initialize the service
 youtube_service = YouTubeCommentsService()
+channel_ingestor = MultiChannelIngestor(
+    youtube_service.api_keys,
+    max_concurrency=INGEST_CONCURRENCY,
+    channel_workers=INGEST_CHANNEL_WORKERS,
+    calls_per_second=INGEST_CALLS_PER_SECOND,
+    max_videos=REFRESH_MAX_VIDEOS,
+    max_comments=REFRESH_MAX_COMMENTS,
+    score_batch=youtube_service.score_sentiment_batch,
+    quota=youtube_service.quota
+)
+response_cache = CompressedResponseCache()
+# Bar chart buckets of the 'returned' scope sent with each cursor
+sent_chart_buckets = SentBuckets()
+
+class ChannelUnavailable(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+def select_channel():
+    """Get the channel selected with the `channel` query parameter and its ingested snapshot"""
+    channel = request.args.get('channel') or CHANNEL_ID
+    if channel == CHANNEL_ID:
+        return channel, None
+    if channel not in CHANNEL_IDS:
+        raise ChannelUnavailable(f"Channel {channel} is not tracked", 404)
+    
+    channel_ingestor.start(CHANNEL_IDS, interval=INGEST_INTERVAL)
+    snapshot = channel_ingestor.get_snapshot(channel)
+    if snapshot is None:
+        raise ChannelUnavailable(f"Channel {channel} has not been ingested yet", 503)
+    return channel, snapshot
+
+def get_channel_data(max_videos, max_comments):
+    """Get (comments data, rollup) of the channel selected with the `channel` query parameter"""
+    channel, snapshot = select_channel()
+    if snapshot is None:
+        return youtube_service.get_all_comments_data(max_videos, max_comments), youtube_service.rollups
+    
+    data = youtube_service._build_comments_data(snapshot, max_videos, max_comments)
+    data['snapshot_age'] = round(time.time() - snapshot['fetched_ts'], 1)
+    return data, channel_ingestor.get_rollup(channel)
+
+def iter_channel_data(max_videos, max_comments):
+    """Get (progressive comments data events, rollup) of the selected channel"""
+    channel, snapshot = select_channel()
+    if snapshot is None:
+        return youtube_service.iter_comments_data(max_videos, max_comments), youtube_service.rollups
+    return youtube_service.replay_snapshot(snapshot, max_videos, max_comments), channel_ingestor.get_rollup(channel)
+
+def conditional_json(version, build_payload, age=None):
+    """Get a JSON response for build_payload() with a strong ETag derived from `version`.
+    
+    Requests whose If-None-Match matches get a 304 without building the payload. The
+    body is serialized once per ETag and compressed once per accepted encoding; each
+    encoding gets its own ETag suffix. Without a version the payload is not cached.
+    
+    `age` (seconds since the data was fetched) changes with every request, so it is
+    kept out of the body and sent as the Age header instead.
+    """
+    def build_body():
+        with span('aggregation'):
+            payload = build_payload()
+        with span('jsonify'):
+            return app.json.dumps(payload).encode('utf-8')
+    
+    if version is None:
+        response = Response(build_body(), mimetype='application/json')
+        if age is not None:
+            response.headers['Age'] = str(int(age))
+        return response
+    
+    etag = make_etag(request.path, sorted(request.args.items(multi=True)), version)
+    matched = next((tag for tag in [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]
+                    if request.if_none_match.contains(tag)), None)
+    if matched is not None:
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        encoding = request.accept_encodings.best_match(ENCODINGS) or 'identity'
+        body, encoding = response_cache.get_body(etag, build_body, encoding)
+        response = Response(body, mimetype='application/json')
+        if encoding == 'identity':
+            response.set_etag(etag)
+        else:
+            response.set_etag(f"{etag}-{encoding}")
+            response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    if age is not None:
+        response.headers['Age'] = str(int(age))
+    return response
+
+def encode_cursor(*parts):
+    """Get an opaque pagination cursor for a sort key"""
+    return base64.urlsafe_b64encode(json.dumps(parts).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, types=None):
+    """Get the sort key of a cursor from encode_cursor, raising ValueError if it is malformed.
+    
+    With `types` the key must have exactly one part of each of those types.
+    """
+    try:
+        parts = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(parts, list) or not parts:
+        raise ValueError("Invalid cursor")
+    if types is not None and (len(parts) != len(types) or not all(
+            isinstance(part, kind) and not isinstance(part, bool) for part, kind in zip(parts, types))):
+        raise ValueError("Invalid cursor")
+    return parts
+
+def parse_fields(value):
+    """Get (includes, excludes) projection paths from a `fields` parameter.
+    
+    Members are comma-separated dotted paths such as `videos_with_comments.title`;
+    a leading `-` excludes the member instead.
+    """
+    includes, excludes = [], []
+    for field in (field.strip() for field in (value or '').split(',')):
+        if field:
+            (excludes if field.startswith('-') else includes).append(field.lstrip('-').split('.'))
+    return includes, excludes
+
+def project(value, includes=(), excludes=()):
+    """Get a payload with only the `includes` paths and without the `excludes` paths.
+    
+    Lists are traversed transparently, and an excluded bare name is removed at
+    any depth (e.g. `-authorProfileImageUrl` from every comment). Members that are
+    not selected are never serialized, so excluded comment views are not materialized.
+    """
+    if isinstance(value, (list, CommentView)):
+        return [project(item, includes, excludes) for item in value]
+    if not isinstance(value, dict):
+        return value
+    
+    result = {}
+    for key, item in value.items():
+        if [key] in excludes or (includes and not any(path[0] == key for path in includes)):
+            continue
+        sub_includes = [path[1:] for path in includes if path[0] == key]
+        if any(not path for path in sub_includes):
+            sub_includes = []  # The whole member was selected
+        sub_excludes = [path[1:] for path in excludes if path[0] == key and len(path) > 1]
+        sub_excludes += [path for path in excludes if len(path) == 1]
+        result[key] = project(item, sub_includes, sub_excludes) if sub_includes or sub_excludes else item
+    return result
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
 
 @app.route('/')
 def dashboard():
@@ -273,148 +905,553 @@ def videos():
         logger.error("Template 'videos.html' not found in templates directory")
         return jsonify({'error': 'Template videos.html not found'}), 500
 
-@app.route('/api/chart-data')
-def get_chart_data():
-    """Get data formatted for charts"""
+# Date charts of the returned comments (default), or of every comment ingested for the selected videos
+CHART_SCOPES = ('returned', 'ingested')
+
+def parse_chart_args():
+    """Get validated (max_videos, max_comments, granularity, range, scope) chart parameters"""
     max_videos = request.args.get('max_videos', 10, type=int)
     max_comments = request.args.get('max_comments', 50, type=int)
+    granularity = request.args.get('granularity', 'day')
+    bucket_range = request.args.get('range', type=int)
+    scope = request.args.get('scope', 'returned')
     
     # Validate parameters
     max_videos = min(max(max_videos, 1), 20)  # Between 1 and 20
     max_comments = min(max(max_comments, 10), 100)  # Between 10 and 100
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if bucket_range is not None:
+        bucket_range = min(max(bucket_range, 1), 365)  # Between 1 and 365 buckets
+    if scope not in CHART_SCOPES:
+        raise ValueError(f"scope must be one of {', '.join(CHART_SCOPES)}")
+    return max_videos, max_comments, granularity, bucket_range, scope
+
+def chart_buckets(data, rollups, granularity='day', last=None, scope='returned'):
+    """Get the date buckets of the returned comments, or of every ingested comment of the selected videos"""
+    if scope == 'ingested':
+        video_ids = [video['videoId'] for video in data['videos_with_comments']]
+        return rollups.query(granularity, video_ids, last=last)
+    return aggregate(data['comments'], granularity, last=last)
+
+def build_chart_data(data, rollups, granularity='day', bucket_range=None, scope='returned'):
+    """Get the chart payload for comments data and the rollups of its channel"""
+    # Taken before the query so comments added meanwhile are sent again by the next delta
+    cursor = rollups.cursor()
+    pie_data = build_pie_chart(data)
     
-    try:
-        data = youtube_service.get_all_comments_data(max_videos, max_comments)
-        
-        # Prepare data for pie chart (top 10 videos by comment count)
-        video_counts = data['video_comment_counts']
-        sorted_videos = sorted(video_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        pie_data = {
-            'labels': [video[0] for video in sorted_videos],
-            'values': [video[1] for video in sorted_videos],
-            'colors': ['#FF0000', '#00b894', '#fdcb6e', '#54A0FF', '#5F27CD', 
-                      '#FF9FF3', '#96CEB4', '#FECA57', '#45B7D1', '#FF9F43'][:len(sorted_videos)]
-        }
-        
-        # Prepare data for bar chart (comments by date)
-        comments_by_date = {}
-        for comment in data['comments']:
-            date = comment['date'][:10]  # Extract date part
-            comments_by_date[date] = comments_by_date.get(date, 0) + 1
-        
-        sorted_dates = sorted(comments_by_date.items())[-30:]  # Last 30 days
-        
-        bar_data = {
-            'labels': [item[0] for item in sorted_dates],
-            'values': [item[1] for item in sorted_dates]
-        }
-        
-        # Sentiment trend data
-        sentiment_by_date = {}
-        for comment in data['comments']:
-            date = comment['date'][:10]
-            if date not in sentiment_by_date:
-                sentiment_by_date[date] = {'positive': 0, 'negative': 0, 'neutral': 0}
-            sentiment_by_date[date][comment['sentiment']] += 1
-        
-        sentiment_trend = {
-            'dates': sorted(sentiment_by_date.keys())[-14:],  # Last 14 days
-            'positive': [],
-            'negative': [],
-            'neutral': []
+    # Prepare data for bar chart (comments by date)
+    bar_buckets = chart_buckets(data, rollups, granularity, bucket_range or 30, scope)
+    bar_data, _ = chart_series(bar_buckets)
+    if scope == 'returned':
+        sent_chart_buckets.remember(sent_buckets_key(data, cursor, granularity, bucket_range), bar_buckets)
+    
+    # Sentiment trend data
+    _, sentiment_trend = chart_series(bar_buckets[-(bucket_range or 14):])
+    
+    return {
+        'pie_chart': pie_data,
+        'bar_chart': bar_data,
+        'sentiment_trend': sentiment_trend,
+        'summary': chart_summary(data),
+        'cursor': cursor
+    }
+
+def sent_buckets_key(data, cursor, granularity, bucket_range):
+    return (cursor, granularity, bucket_range, tuple(video['videoId'] for video in data['videos_with_comments']))
+
+def build_pie_chart(data):
+    """Get the pie chart of the top 10 videos by comment count"""
+    video_counts = data['video_comment_counts']
+    sorted_videos = sorted(video_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    
+    return {
+        'labels': [video[0] for video in sorted_videos],
+        'values': [video[1] for video in sorted_videos],
+        'colors': ['#FF0000', '#00b894', '#fdcb6e', '#54A0FF', '#5F27CD', 
+                  '#FF9FF3', '#96CEB4', '#FECA57', '#45B7D1', '#FF9F43'][:len(sorted_videos)]
+    }
+
+def chart_series(buckets):
+    """Get the bar chart and sentiment trend series of rollup buckets"""
+    bar_data = {
+        'labels': [bucket for bucket, _ in buckets],
+        'values': [sum(totals[s]['count'] for s in totals) for _, totals in buckets]
+    }
+    sentiment_trend = {
+        'dates': [bucket for bucket, _ in buckets],
+        'positive': [totals['positive']['count'] for _, totals in buckets],
+        'negative': [totals['negative']['count'] for _, totals in buckets],
+        'neutral': [totals['neutral']['count'] for _, totals in buckets],
+        'likes': [sum(totals[s]['likes'] for s in totals) for _, totals in buckets],
+        'avg_polarity': [
+            round(sum(totals[s]['polarity_sum'] for s in totals) / max(sum(totals[s]['count'] for s in totals), 1), 4)
+            for _, totals in buckets
+        ]
+    }
+    return bar_data, sentiment_trend
+
+def chart_summary(data):
+    return {
+        'total_comments': data['total_comments'],
+        'total_videos': data['total_videos'],
+        'sentiment_counts': data['sentiment_counts'],
+        'total_likes': data.get('total_likes', 0),
+        'avg_likes_per_comment': data.get('avg_likes_per_comment', 0),
+        'processed_at': data.get('processed_at')
+    }
+
+def delta_comments(changes):
+    """Get the comments of rollup changes in the shape sent to clients"""
+    return [
+        {
+            'video_id': video_id,
+            'id': comment.get('id'),
+            'author': comment['author'],
+            'comment': comment['comment'][:200],
+            'likeCount': comment['likeCount'],
+            'sentiment': comment['sentiment'],
+            'date': comment['date']
         }
-        
-        for date in sentiment_trend['dates']:
-            day_data = sentiment_by_date.get(date, {'positive': 0, 'negative': 0, 'neutral': 0})
-            sentiment_trend['positive'].append(day_data['positive'])
-            sentiment_trend['negative'].append(day_data['negative'])
-            sentiment_trend['neutral'].append(day_data['neutral'])
-        
-        return jsonify({
-            'pie_chart': pie_data,
-            'bar_chart': bar_data,
-            'sentiment_trend': sentiment_trend,
-            'summary': {
-                'total_comments': data['total_comments'],
-                'total_videos': data['total_videos'],
-                'sentiment_counts': data['sentiment_counts'],
-                'total_likes': data.get('total_likes', 0),
-                'avg_likes_per_comment': data.get('avg_likes_per_comment', 0)
-            }
-        })
+        for video_id, comment in changes['comments']
+    ]
+
+def build_chart_delta(data, rollups, since, granularity='day', bucket_range=None, scope='returned'):
+    """Get only what changed in the chart data since a cursor.
+    
+    Returns the new totals of the buckets that changed, to be merged into the
+    charts by the client, together with the small constant-size pie chart and
+    summary; when nothing changed the bucket series are empty. With the 'ingested'
+    scope those are the buckets the added comments fell in. With the 'returned'
+    scope comments also drop out of the newest N per video, so the buckets are
+    diffed against those sent with the cursor, and buckets left empty are sent
+    with zero counts; when that is not possible the complete (range-bounded)
+    series is sent with `complete_series` set. Falls back
+    to the full payload with `reset` set when the cursor can no longer be served.
+    """
+    video_ids = [video['videoId'] for video in data['videos_with_comments']]
+    changes = rollups.changes_since(since, granularity, video_ids)
+    if changes is None:
+        payload = build_chart_data(data, rollups, granularity, bucket_range, scope)
+        payload['reset'] = True
+        return payload
+    
+    complete = False
+    if scope == 'ingested':
+        bar_data, sentiment_trend = chart_series(changes['buckets'])
+    else:
+        buckets = chart_buckets(data, rollups, granularity, bucket_range or 30)
+        changed = sent_chart_buckets.changed(sent_buckets_key(data, since, granularity, bucket_range), buckets)
+        sent_chart_buckets.remember(sent_buckets_key(data, changes['cursor'], granularity, bucket_range), buckets)
+        complete = changed is None
+        if complete:
+            bar_data, _ = chart_series(buckets)
+            _, sentiment_trend = chart_series(buckets[-(bucket_range or 14):])
+        else:
+            bar_data, sentiment_trend = chart_series(changed)
+    return {
+        'reset': False,
+        'complete_series': complete,
+        'cursor': changes['cursor'],
+        'pie_chart': build_pie_chart(data),
+        'bar_chart': bar_data,
+        'sentiment_trend': sentiment_trend,
+        'summary': chart_summary(data)
+    }
+
+@app.route('/api/chart-data')
+def get_chart_data():
+    """Get data formatted for charts.
+    
+    The bar chart and sentiment trend bucket the returned comments (the newest
+    `max_comments` of each selected video) by `granularity` (hour, day or week);
+    with `scope=ingested` they cover every comment ingested for the selected videos
+    instead. `range` limits both to the latest N buckets; by default the bar chart
+    shows 30 and the trend 14.
+    
+    With `since` (a cursor from a previous response or an ISO 8601 timestamp) only
+    the comments added and the buckets changed since then are returned. The Age
+    header tells how many seconds ago the data was fetched.
+    """
+    since = request.args.get('since')
+    try:
+        max_videos, max_comments, granularity, bucket_range, scope = parse_chart_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        data, rollups = get_channel_data(max_videos, max_comments)
+        # Charts change with the snapshot and with every comment added to the rollups
+        version = (data.get('processed_at'), rollups.version) if data.get('processed_at') else None
+        if since:
+            return conditional_json(version, lambda: build_chart_delta(data, rollups, since, granularity, bucket_range, scope),
+                                    data.get('snapshot_age'))
+        return conditional_json(version, lambda: build_chart_data(data, rollups, granularity, bucket_range, scope),
+                                data.get('snapshot_age'))
+    except ChannelUnavailable as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         logger.error(f"Error in get_chart_data: {e}")
         return jsonify({
             'error': str(e)
         }), 500
 
+@app.route('/api/chart-data/stream')
+def stream_chart_data():
+    """Stream chart data as Server-Sent Events.
+    
+    Emits a `videos` event with the videos being analyzed, a `video` event with the
+    comments, sentiment counts and running totals of each video as soon as it is
+    ready, and a final `summary` event with the same payload as /api/chart-data (or a
+    `failure` event with the error).
+    """
+    try:
+        max_videos, max_comments, granularity, bucket_range, scope = parse_chart_args()
+        events, rollups = iter_channel_data(max_videos, max_comments)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ChannelUnavailable as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    def generate():
+        totals = {
+            'total_comments': 0,
+            'total_videos': 0,
+            'total_likes': 0,
+            'sentiment_counts': {'positive': 0, 'negative': 0, 'neutral': 0}
+        }
+        try:
+            for event, payload in events:
+                if event == 'videos':
+                    yield sse_event('videos', {
+                        'videos': [{'videoId': video['videoId'], 'title': video['title']} for video in payload]
+                    })
+                elif event == 'video':
+                    i, video, comments = payload
+                    sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
+                    for comment in comments:
+                        sentiment_counts[comment['sentiment']] += 1
+                    likes = sum(comment['likeCount'] for comment in comments)
+                    
+                    if comments:
+                        totals['total_videos'] += 1
+                    totals['total_comments'] += len(comments)
+                    totals['total_likes'] += likes
+                    for sentiment, count in sentiment_counts.items():
+                        totals['sentiment_counts'][sentiment] += count
+                    totals['avg_likes_per_comment'] = round(totals['total_likes'] / totals['total_comments'], 2) if totals['total_comments'] else 0
+                    
+                    yield sse_event('video', {
+                        'index': i,
+                        'video': {
+                            'title': video['title'],
+                            'videoId': video['videoId'],
+                            'publishedAt': video['publishedAt'],
+                            'thumbnail': video.get('thumbnail', '')
+                        },
+                        'comments': comments,
+                        'sentiment_counts': sentiment_counts,
+                        'total_likes': likes,
+                        'totals': totals
+                    })
+                else:
+                    summary = build_chart_data(payload, rollups, granularity, bucket_range, scope)
+                    summary['summary']['snapshot_age'] = payload.get('snapshot_age', 0)
+                    yield sse_event('summary', summary)
+        except Exception as e:
+            logger.error(f"Error in stream_chart_data: {e}")
+            yield sse_event('failure', {'error': str(e)})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/sentiment-data')
 def get_sentiment_data():
-    """Get detailed sentiment data with comments"""
+    """Get detailed sentiment data with comments.
+    
+    With `since` (a cursor from a previous response or an ISO 8601 timestamp) the
+    comments added since then are returned as `new_comments` instead of the videos
+    and samples, together with the current totals.
+    
+    `sort` (date or likes) orders each video's comments and picks the newest or most
+    liked samples. `limit` returns that many videos per page; `next_page` is then set
+    when more follow and is passed back as `page`. `fields` projects the response
+    (see parse_fields), e.g. `-videos_with_comments.comments` drops the comment lists.
+    The Age header tells how many seconds ago the data was fetched.
+    """
+    since = request.args.get('since')
     max_videos = request.args.get('max_videos', 5, type=int)
     max_comments = request.args.get('max_comments', 20, type=int)
+    sort = request.args.get('sort')
+    limit = request.args.get('limit', type=int)
+    page_token = request.args.get('page')
+    includes, excludes = parse_fields(request.args.get('fields'))
     
     # Validate parameters
     max_videos = min(max(max_videos, 1), 10)  # Between 1 and 10
     max_comments = min(max(max_comments, 10), 50)  # Between 10 and 50
+    if limit is not None:
+        limit = min(max(limit, 1), max_videos)
+    if sort is not None and sort not in SORT_FIELDS:
+        return jsonify({'error': f"sort must be one of {', '.join(SORT_FIELDS)}"}), 400
+    try:
+        # Pages of videos follow their (publishedAt, videoId) key
+        after = tuple(decode_cursor(page_token, (str, str))) if page_token else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        data = youtube_service.get_all_comments_data(max_videos, max_comments)
-        
-        # Get sample comments for each sentiment
-        sample_comments = {'positive': [], 'negative': [], 'neutral': []}
-        for comment in data['comments']:
-            sentiment = comment['sentiment']
-            if len(sample_comments[sentiment]) < 10:  # Limit to 10 samples per sentiment
-                sample_comments[sentiment].append({
-                    'author': comment['author'],
-                    'comment': comment['comment'][:200],  # Truncate long comments
-                    'likeCount': comment['likeCount'],
-                    'date': comment['date']
-                })
+        data, rollups = get_channel_data(max_videos, max_comments)
         
-        return jsonify({
-            'videos_with_comments': data['videos_with_comments'],
-            'sentiment_summary': data['sentiment_counts'],
-            'sample_comments': sample_comments,
-            'total_comments': data['total_comments'],
-            'total_videos': data['total_videos'],
-            'total_likes': data.get('total_likes', 0),
-            'avg_likes_per_comment': data.get('avg_likes_per_comment', 0)
-        })
+        def build_delta():
+            video_ids = [video['videoId'] for video in data['videos_with_comments']]
+            changes = rollups.changes_since(since, video_ids=video_ids)
+            if changes is None:
+                payload = build()
+                payload['reset'] = True
+                return payload
+            return {
+                'reset': False,
+                'cursor': changes['cursor'],
+                'new_comments': delta_comments(changes),
+                'sentiment_summary': data['sentiment_counts'],
+                'total_comments': data['total_comments'],
+                'total_videos': data['total_videos'],
+                'total_likes': data.get('total_likes', 0),
+                'avg_likes_per_comment': data.get('avg_likes_per_comment', 0),
+                'processed_at': data.get('processed_at')
+            }
+        
+        def build():
+            cursor = rollups.cursor()
+            all_comments = data['comments'].sorted_by(sort) if sort else data['comments']
+            
+            # Pages follow the (publishedAt, videoId) key, newest first, so videos published
+            # at the same time are neither skipped nor repeated
+            videos = sorted(data['videos_with_comments'], key=lambda video: (video['publishedAt'], video['videoId']),
+                            reverse=True)
+            if after is not None:
+                videos = [video for video in videos if (video['publishedAt'], video['videoId']) < after]
+            next_page = None
+            if limit is not None and len(videos) > limit:
+                videos = videos[:limit]
+                next_page = encode_cursor(videos[-1]['publishedAt'], videos[-1]['videoId'])
+            if sort:
+                videos = [dict(video, comments=video['comments'].sorted_by(sort)) for video in videos]
+            
+            # Get sample comments for each sentiment
+            sample_comments = {'positive': [], 'negative': [], 'neutral': []}
+            for comment in all_comments:
+                sentiment = comment['sentiment']
+                if len(sample_comments[sentiment]) < 10:  # Limit to 10 samples per sentiment
+                    sample_comments[sentiment].append({
+                        'author': comment['author'],
+                        'comment': comment['comment'][:200],  # Truncate long comments
+                        'likeCount': comment['likeCount'],
+                        'date': comment['date']
+                    })
+                    if all(len(samples) >= 10 for samples in sample_comments.values()):
+                        break
+        
+            return {
+                'videos_with_comments': videos,
+                'next_page': next_page,
+                'sentiment_summary': data['sentiment_counts'],
+                'sample_comments': sample_comments,
+                'total_comments': data['total_comments'],
+                'total_videos': data['total_videos'],
+                'total_likes': data.get('total_likes', 0),
+                'avg_likes_per_comment': data.get('avg_likes_per_comment', 0),
+                'processed_at': data.get('processed_at'),
+                'cursor': cursor
+            }
+        
+        version = (data.get('processed_at'), rollups.version) if data.get('processed_at') else None
+        builder = build_delta if since else build
+        return conditional_json(version, lambda: project(builder(), includes, excludes), data.get('snapshot_age'))
+    except ChannelUnavailable as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         logger.error(f"Error in get_sentiment_data: {e}")
         return jsonify({
             'error': str(e)
         }), 500
 
+@app.route('/api/export/comments')
+def export_comments():
+    """Stream scored comments as NDJSON, one comment per line.
+
+    Filters: `video_id` (repeatable or comma-separated), `since` (exclusive) and
+    `until` (inclusive) as ISO 8601 dates or timestamps, `sentiment` (comma-separated)
+    and `limit`. Comments are generated lazily, so memory does not grow with the export.
+    An export that fails once streaming has begun ends with an `{"error": ...}` line.
+    """
+    video_ids = [video_id for value in request.args.getlist('video_id') for video_id in value.split(',') if video_id]
+    since = request.args.get('since')
+    until = request.args.get('until')
+    sentiments = [s for s in request.args.get('sentiment', '').split(',') if s]
+    limit = request.args.get('limit', type=int)
+    max_videos = min(max(request.args.get('max_videos', 10, type=int), 1), 50)  # Between 1 and 50
+
+    invalid = [s for s in sentiments if s not in ('positive', 'negative', 'neutral')]
+    if invalid:
+        return jsonify({'error': f"Unknown sentiment: {', '.join(invalid)}"}), 400
+    for name, value in (('since', since), ('until', until)):
+        if value and not re.match(r'^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2})?(\.\d+)?Z?)?$', value):
+            return jsonify({'error': f"{name} must be an ISO 8601 date or timestamp"}), 400
+    if until and len(until) == 10:
+        until += 'T23:59:59Z'  # A bare date includes the whole day
+
+    def generate():
+        try:
+            comments = youtube_service.iter_export_comments(video_ids, since, until, sentiments, max_videos)
+            for count, comment in enumerate(comments):
+                if limit is not None and count >= limit:
+                    break
+                yield json.dumps(comment) + '\n'
+        except Exception as e:
+            logger.error(f"Error in export_comments: {e}")
+            yield json.dumps({'error': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': 'attachment; filename=comments.ndjson',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/video-details/<video_id>')
 def get_video_details(video_id):
-    """Get detailed information about a specific video"""
-    max_comments = request.args.get('max_comments', 100, type=int)
+    """Get detailed information about a specific video.
+    
+    Loads up to `max_comments` (1-100) comments and returns them `limit` at a time,
+    sorted by `sort` (date or likes, newest or most liked first). `next_page` is set
+    when more comments follow and is passed back as `page`. `fields` projects the
+    response (see parse_fields). Counts and totals cover every loaded comment.
+    """
+    max_comments = min(max(request.args.get('max_comments', 100, type=int), 1), 100)  # Between 1 and 100
+    limit = min(max(request.args.get('limit', max_comments, type=int), 1), max_comments)
+    sort = request.args.get('sort', 'date')
+    page_token = request.args.get('page')
+    includes, excludes = parse_fields(request.args.get('fields'))
+    
+    if sort not in SORT_FIELDS:
+        return jsonify({'error': f"sort must be one of {', '.join(SORT_FIELDS)}"}), 400
+    try:
+        after = None
+        if page_token:
+            page_sort, *after = decode_cursor(page_token, (str, *SORT_KEY_TYPES[sort]))
+            if page_sort != sort:
+                raise ValueError("Page token was issued for a different sort")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        comments = youtube_service.get_comments_for_video(video_id, max_comments)
+        comments = to_comment_view(youtube_service.get_comments_for_video(video_id, max_comments))
         
-        # Calculate sentiment for this video
-        sentiment_counts = {'positive': 0, 'negative': 0, 'neutral': 0}
-        for comment in comments:
-            sentiment_counts[comment['sentiment']] += 1
+        # The comment list has no snapshot of its own; its ids and like counts version it
+        version = make_etag(*(f"{comments.table.ids[i]}:{comments.table.likes[i]}" for i in comments.rows))
         
-        return jsonify({
-            'video_id': video_id,
-            'comments': comments,
-            'comment_count': len(comments),
-            'sentiment_counts': sentiment_counts,
-            'total_likes': sum(comment['likeCount'] for comment in comments)
-        })
+        def build():
+            page, last_key = comments.sorted_by(sort).page(sort, after, limit)
+            return project({
+                'video_id': video_id,
+                'comments': page,
+                'comment_count': len(comments),
+                'sentiment_counts': comments.sentiment_counts(),
+                'total_likes': comments.total_likes(),
+                'next_page': encode_cursor(sort, *last_key) if last_key else None
+            }, includes, excludes)
+        
+        return conditional_json(version, build)
     except Exception as e:
         logger.error(f"Error getting video details for {video_id}: {e}")
         return jsonify({
             'error': str(e)
         }), 500
 
+@app.route('/api/stats')
+def get_stats():
+    """Get cache and upstream call statistics"""
+    return jsonify({
+        'snapshot_cache': youtube_service.snapshot_cache.stats(),
+        'upstream': youtube_service.http.stats(),
+        'upstream_cache': youtube_service.http.cache_stats(),
+        'sentiment_memo': sentiment_memo.stats(),
+        'refresher': youtube_service.refresher.stats() if youtube_service.refresher else None,
+        'single_flight': youtube_service.single_flight.stats(),
+        'rollups': youtube_service.rollups.stats(),
+        'quota': youtube_service.quota.stats(),
+        'channels': channel_ingestor.stats(),
+        'response_cache': response_cache.stats()
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Get Prometheus metrics summed over all worker processes"""
+    rendered = render_metrics()
+    if rendered is None:
+        return jsonify({'error': 'Metrics require the prometheus_client package'}), 404
+    body, content_type = rendered
+    return Response(body, content_type=content_type)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_requested_profile():
+    """Profile the request when it carries an allowed token in the X-Profile header"""
+    value = request.headers.get(PROFILE_HEADER) if PROFILE_TOKENS else None
+    if value is None:
+        return
+    allowed, sample = parse_profile_header(value)
+    if not allowed:
+        logger.warning(f"Ignoring {PROFILE_HEADER} header with an unknown token on {request.path}")
+        return
+    g.profile, g.profile_token = start_profile(f"{request.method} {request.full_path}", sample)
+
+@app.after_request
+def attach_profile(response):
+    profile = g.get('profile')
+    if profile is None:
+        return response
+    profile.finish()
+    response.headers['Server-Timing'] = profile.server_timing()
+    response.headers['X-Profile-Id'] = profile.id
+    logger.info(f"Profile {profile.id} of {profile.name}: {round(profile.wall_ms, 1)} ms {profile.summary()}")
+    if profile.sampler is not None:
+        folded_path = profile.dump()
+        if folded_path:
+            logger.info(f"Profile {profile.id}: {profile.sampler.samples} samples written to {folded_path}")
+    return response
+
+@app.teardown_request
+def end_requested_profile(error=None):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        end_profile(token)
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Templated route, so ids in the path do not create new series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(route, request.method, str(response.status_code)).observe(time.perf_counter() - started)
+    return response
+
+@app.route('/api/channels')
+def get_channels():
+    """Get the channels that can be selected with ?channel="""
+    channel_ingestor.start(CHANNEL_IDS, interval=INGEST_INTERVAL)
+    ingested = channel_ingestor.stats()['channels']
+    return jsonify({
+        'default': CHANNEL_ID,
+        'channels': [CHANNEL_ID] + CHANNEL_IDS,
+        'ingested': [CHANNEL_ID] + [channel for channel in CHANNEL_IDS if channel in ingested]
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     try:
@@ -0,0 +1,83 @@
+"""Compare two benchmark result files from bench.run.
+
+    python -m bench.compare bench/results/OLD.json bench/results/NEW.json
+
+Prints every metric side by side with its relative change and flags changes
+in the bad direction larger than --threshold percent; exits with status 1
+when any regression is flagged and --fail-on-regression is given.
+"""
+import argparse
+import json
+import sys
+
+# Metric suffixes where a larger value is an improvement; everything else
+# measured (latencies, sizes, memory, upstream calls) is better when smaller
+HIGHER_IS_BETTER = ('comments_per_sec',)
+IGNORED = ('n', 'comments', 'seconds')
+
+
+def flatten(value, prefix=''):
+    """Get {dotted.path: number} of the numeric leaves of a results document"""
+    if isinstance(value, dict):
+        items = {}
+        for key, item in value.items():
+            items.update(flatten(item, f"{prefix}{key}."))
+        return items
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix[:-1]: value}
+    return {}
+
+
+def compare(old, new, threshold):
+    """Get (rows, regressions) comparing the metrics of two results documents"""
+    metrics = {section: old.get(section, {}) for section in ('endpoints', 'sentiment_service', 'memory', 'upstream')}
+    old_values = flatten(metrics)
+    new_values = flatten({section: new.get(section, {}) for section in metrics})
+
+    rows = []
+    regressions = []
+    for name in sorted(set(old_values) | set(new_values)):
+        if name.rsplit('.', 1)[-1] in IGNORED:
+            continue
+        before, after = old_values.get(name), new_values.get(name)
+        change = None
+        if before is not None and after is not None and before:
+            change = (after - before) / abs(before) * 100
+        worse = change is not None and (change < -threshold if name.endswith(HIGHER_IS_BETTER) else change > threshold)
+        rows.append((name, before, after, change, worse))
+        if worse:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help="percent change flagged as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    if old.get('config') != new.get('config'):
+        print("warning: the runs used different configurations; differences may not be regressions")
+
+    rows, regressions = compare(old, new, args.threshold)
+    print(f"{'metric':55} {old.get('git_commit') or 'old':>12} {new.get('git_commit') or 'new':>12} {'change':>9}")
+    for name, before, after, change, worse in rows:
+        before_text = '-' if before is None else f"{before:,.2f}"
+        after_text = '-' if after is None else f"{after:,.2f}"
+        change_text = '' if change is None else f"{change:+.1f}%"
+        print(f"{name:55} {before_text:>12} {after_text:>12} {change_text:>9}{'  REGRESSION' if worse else ''}")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold}%")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""Local stand-in for the YouTube Data API v3 used by the benchmarks.
+
+Serves deterministic synthetic channels from the search, channels,
+playlistItems, videos and commentThreads endpoints, with optional injected
+latency and 403 quota errors. Successful responses carry an ETag and are
+answered with 304 Not Modified on a matching If-None-Match. Any channel id resolves to a channel of the
+configured size.
+
+Run standalone with:
+
+    python -m bench.fake_youtube --port 8765 --videos 20 --comments 500
+
+and point the app at it with YOUTUBE_API_BASE_URL=http://127.0.0.1:8765/youtube/v3
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+QUOTA_COSTS = {'search': 100}
+
+POSITIVE = ['love this car', 'great review', 'amazing handling', 'best sedan ever', 'really nice interior',
+            'excellent fuel economy', 'beautiful design', 'perfect daily driver', 'awesome video as always']
+NEGATIVE = ['terrible brakes', 'worst infotainment', 'bad reliability', 'awful road noise', 'so boring to drive',
+            'horrible dealer experience', 'ugly front end', 'disappointing range', 'poor build quality']
+NEUTRAL = ['what trim is this', 'filmed in which city', 'how much does it cost', 'first', 'watching from Berlin',
+           'is it hybrid or petrol', 'when is the next video', 'which tires are those', 'part two please']
+FILLER = ['honestly', 'the', 'and', 'this', 'compared to my old one', 'for the money', 'at highway speed', 'lol', '']
+
+
+def _seed(*parts):
+    return int(hashlib.md5('/'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:8], 16)
+
+
+def _timestamp(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FakeYouTube:
+    """Synthetic channel data and the quota/latency behaviour of the fake API"""
+
+    def __init__(self, videos=20, comments=500, latency_ms=0, quota_units=None, quota_error_rate=0.0, seed=0):
+        self.videos_per_channel = videos
+        self.comments_per_video = comments
+        self.latency_ms = latency_ms
+        self.quota_units = quota_units
+        self.quota_error_rate = quota_error_rate
+        self.seed = seed
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self._channel_videos = {}
+        self._comments = {}
+        self._used = {}
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.quota_errors = 0
+        self.not_modified = 0
+
+    def channel_videos(self, channel_id):
+        """Get the channel's videos, newest first"""
+        with self._lock:
+            if channel_id not in self._channel_videos:
+                rng = random.Random(_seed(self.seed, channel_id))
+                videos = []
+                published = self.now
+                for n in range(self.videos_per_channel):
+                    published -= timedelta(hours=rng.randint(6, 36))
+                    video_id = f"{channel_id[-6:]}v{n:04d}"
+                    videos.append({
+                        'id': video_id,
+                        'title': f"Synthetic review #{n}: {rng.choice(['SUV', 'sedan', 'EV', 'truck', 'coupe'])} long-term test",
+                        'description': 'Synthetic benchmark video. ' * 8,
+                        'publishedAt': _timestamp(published),
+                        'channelId': channel_id
+                    })
+                self._channel_videos[channel_id] = videos
+            return self._channel_videos[channel_id]
+
+    def video(self, video_id):
+        for videos in list(self._channel_videos.values()):
+            for video in videos:
+                if video['id'] == video_id:
+                    return video
+        return None
+
+    def video_comments(self, video_id):
+        """Get the video's comments, newest first"""
+        with self._lock:
+            if video_id not in self._comments:
+                rng = random.Random(_seed(self.seed, video_id))
+                comments = []
+                published = self.now
+                for n in range(self.comments_per_video):
+                    published -= timedelta(seconds=rng.randint(30, 3600))
+                    text = ' '.join(filter(None, [rng.choice(FILLER), rng.choice(rng.choice([POSITIVE, NEGATIVE, NEUTRAL])),
+                                                  rng.choice(FILLER), str(n)]))
+                    author = rng.randint(0, 999)
+                    comments.append({
+                        'id': f"{video_id}c{n:06d}",
+                        'textDisplay': text,
+                        'authorDisplayName': f"@driver{author}",
+                        'authorProfileImageUrl': f"https://yt3.ggpht.com/ytc/synthetic-avatar-{author:04d}=s48-c-k-c0x00ffffff-no-rj",
+                        'likeCount': int(rng.paretovariate(1.5)) - 1,
+                        'publishedAt': _timestamp(published)
+                    })
+                self._comments[video_id] = comments
+            return self._comments[video_id]
+
+    def charge(self, key, endpoint):
+        """Charge a call to a key, returning a quota error body or None"""
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            cost = QUOTA_COSTS.get(endpoint, 1)
+            used = self._used.get(key, 0) + cost
+            self._used[key] = used
+            over_quota = self.quota_units is not None and used > self.quota_units
+            if over_quota or (self.quota_error_rate and random.random() < self.quota_error_rate):
+                self.quota_errors += 1
+                return {'error': {
+                    'code': 403,
+                    'message': 'The request cannot be completed because you have exceeded your quota.',
+                    'errors': [{'reason': 'quotaExceeded', 'domain': 'youtube.quota'}]
+                }}
+        return None
+
+    def handle(self, endpoint, params):
+        """Get (status, body) of an API call"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        error = self.charge(params.get('key', ''), endpoint)
+        if error is not None:
+            return 403, error
+
+        handler = getattr(self, f"api_{endpoint}", None)
+        if handler is None:
+            return 404, {'error': {'code': 404, 'message': f"Unknown endpoint {endpoint}", 'errors': [{'reason': 'notFound'}]}}
+        return 200, handler(params)
+
+    @staticmethod
+    def _page(items, params, default_size, max_size):
+        size = min(int(params.get('maxResults', default_size)), max_size)
+        start = int(params.get('pageToken') or 0)
+        page = {'items': items[start:start + size]}
+        if start + size < len(items):
+            page['nextPageToken'] = str(start + size)
+        return page
+
+    def api_search(self, params):
+        videos = self.channel_videos(params.get('channelId', 'UCsynthetic'))
+        published_after = params.get('publishedAfter')
+        if published_after:
+            videos = [video for video in videos if video['publishedAt'] > published_after]
+        items = [{
+            'id': {'kind': 'youtube#video', 'videoId': video['id']},
+            'snippet': {
+                'title': video['title'],
+                'description': video['description'],
+                'publishedAt': video['publishedAt'],
+                'thumbnails': {'default': {'url': f"https://i.ytimg.com/vi/{video['id']}/default.jpg"},
+                               'medium': {'url': f"https://i.ytimg.com/vi/{video['id']}/mqdefault.jpg"}}
+            }
+        } for video in videos]
+        return self._page(items, params, 5, 50)
+
+    def api_channels(self, params):
+        return {'items': [
+            {'id': channel_id, 'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}}}
+            for channel_id in params.get('id', '').split(',') if channel_id
+        ]}
+
+    def api_playlistItems(self, params):
+        videos = self.channel_videos('UC' + params.get('playlistId', 'UUsynthetic')[2:])
+        items = [{
+            'snippet': {
+                'title': video['title'],
+                'description': video['description'],
+                'publishedAt': video['publishedAt'],
+                'thumbnails': {'default': {'url': f"https://i.ytimg.com/vi/{video['id']}/default.jpg"},
+                               'medium': {'url': f"https://i.ytimg.com/vi/{video['id']}/mqdefault.jpg"}},
+                'resourceId': {'kind': 'youtube#video', 'videoId': video['id']}
+            },
+            'contentDetails': {'videoId': video['id'], 'videoPublishedAt': video['publishedAt']}
+        } for video in videos]
+        return self._page(items, params, 5, 50)
+
+    def api_videos(self, params):
+        items = []
+        for video_id in params.get('id', '').split(','):
+            if self.video(video_id) is not None:
+                items.append({'id': video_id, 'statistics': {'commentCount': str(self.comments_per_video)}})
+        return {'items': items}
+
+    def api_commentThreads(self, params):
+        comments = self.video_comments(params.get('videoId', ''))
+        items = [{
+            'id': comment['id'],
+            'snippet': {
+                'videoId': params.get('videoId'),
+                'topLevelComment': {'id': comment['id'], 'snippet': comment}
+            }
+        } for comment in comments]
+        return self._page(items, params, 20, 100)
+
+    def stats(self):
+        with self._lock:
+            return {'calls': dict(self.calls), 'quota_errors': self.quota_errors, 'not_modified': self.not_modified}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        status, body = self.server.api.handle(endpoint, params)
+        payload = json.dumps(body).encode('utf-8')
+        etag = f'"{hashlib.md5(payload).hexdigest()}"' if status == 200 else None
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            with self.server.api._lock:
+                self.server.api.not_modified += 1
+            status, payload = 304, b''
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(api, host='127.0.0.1', port=0):
+    """Start the fake API in a background thread, returning (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.api = api
+    threading.Thread(target=server.serve_forever, name='fake-youtube', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/youtube/v3"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake YouTube Data API v3")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--videos', type=int, default=20, help="videos per channel")
+    parser.add_argument('--comments', type=int, default=500, help="comments per video")
+    parser.add_argument('--latency-ms', type=float, default=0, help="delay added to every call")
+    parser.add_argument('--quota-units', type=int, default=None, help="quota units per key before 403 quotaExceeded")
+    parser.add_argument('--quota-error-rate', type=float, default=0.0, help="probability of a 403 quotaExceeded per call")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    api = FakeYouTube(args.videos, args.comments, args.latency_ms, args.quota_units, args.quota_error_rate, args.seed)
+    server, base_url = serve(api, args.host, args.port)
+    print(f"Serving fake YouTube Data API at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
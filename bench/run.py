@@ -0,0 +1,224 @@
+"""Offline benchmark of the dashboard against the fake YouTube Data API.
+
+Starts bench.fake_youtube in-process, points the app at it and reports:
+
+- cold, warm and refetch p50/p95 latency of /api/chart-data,
+  /api/sentiment-data and /api/video-details/<id>
+- SentimentService throughput in comments per second
+- peak RSS and peak traced Python heap of a cold build
+- the upstream calls and quota errors the fake API saw
+
+Results are written as JSON (bench/results/<timestamp>-<commit>.json by
+default); compare two runs with `python -m bench.compare OLD NEW`.
+
+    python -m bench.run --videos 20 --comments 500 --latency-ms 50
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from bench.fake_youtube import FakeYouTube, serve
+
+SCHEMA_VERSION = 1
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def summarize(samples):
+    """Get p50/p95/mean/max in milliseconds of latency samples in seconds"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'n': 0}
+
+    def percentile(q):
+        return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)] * 1000
+
+    return {
+        'n': len(ordered),
+        'p50_ms': round(percentile(0.50), 3),
+        'p95_ms': round(percentile(0.95), 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_app(base_url, workdir):
+    """Point the app at the fake API with throwaway state files, then import it"""
+    os.environ.update({
+        'YOUTUBE_API_BASE_URL': base_url,
+        'API_KEY_2': 'bench-key',
+        'COMMENT_STORE_PATH': os.path.join(workdir, 'comments.db'),
+        'QUOTA_STATE_PATH': os.path.join(workdir, 'quota_state.json'),
+        'SENTIMENT_MEMO_PATH': '',
+        # Background work would race with the measured requests
+        'BACKGROUND_REFRESH': '0',
+        'CHANNEL_IDS': ''
+    })
+    import app
+    import logging
+    logging.disable(logging.WARNING)
+    return app
+
+
+def reset_caches(app):
+    """Drop the in-process snapshot and response caches (the comment store is kept)"""
+    app.youtube_service.snapshot_cache.clear()
+    app.response_cache = type(app.response_cache)(app.response_cache.max_entries)
+
+
+def time_request(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return elapsed, len(response.data)
+
+
+def bench_endpoints(app, urls, iterations, refetch_iterations):
+    """Measure cold, warm and refetch latency of each endpoint"""
+    client = app.app.test_client()
+    results = {}
+    for name, url in urls.items():
+        cold, size = time_request(client, url)
+        warm = [time_request(client, url)[0] for _ in range(iterations)]
+        refetch = []
+        for _ in range(refetch_iterations):
+            reset_caches(app)
+            refetch.append(time_request(client, url)[0])
+        results[name] = {
+            'url': url,
+            'response_bytes': size,
+            'cold_ms': round(cold * 1000, 3),
+            'warm': summarize(warm),
+            'refetch': summarize(refetch)
+        }
+    return results
+
+
+def bench_sentiment(count):
+    """Measure SentimentService throughput on unique and on repeated comments"""
+    from services.comment_processor import SentimentService
+    from bench.fake_youtube import POSITIVE, NEGATIVE, NEUTRAL, FILLER
+
+    phrases = POSITIVE + NEGATIVE + NEUTRAL
+    texts = [f"{FILLER[n % len(FILLER)]} {phrases[n % len(phrases)]} number {n}" for n in range(count)]
+    service = SentimentService()
+
+    results = {}
+    for name, batch in (('unique', texts), ('repeated', texts)):
+        start = time.perf_counter()
+        service.analyze_batch(batch)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            'comments': len(batch),
+            'seconds': round(elapsed, 4),
+            'comments_per_sec': round(len(batch) / elapsed, 1) if elapsed else None
+        }
+    return results
+
+
+def bench_memory(app, url):
+    """Trace the Python heap while building one snapshot from scratch"""
+    from services.bulk_score import peak_rss_mb
+
+    reset_caches(app)
+    app.youtube_service.comment_store = None  # Fetch and score everything again
+    client = app.app.test_client()
+    tracemalloc.start()
+    try:
+        time_request(client, url)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'traced_peak_mb': round(peak / (1024 * 1024), 2),
+        'traced_retained_mb': round(current / (1024 * 1024), 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard against a fake YouTube Data API")
+    parser.add_argument('--videos', type=int, default=20, help="videos per synthetic channel")
+    parser.add_argument('--comments', type=int, default=500, help="comments per synthetic video")
+    parser.add_argument('--latency-ms', type=float, default=20, help="latency injected into every upstream call")
+    parser.add_argument('--quota-units', type=int, default=None, help="quota units per key before 403 quotaExceeded")
+    parser.add_argument('--quota-error-rate', type=float, default=0.0, help="probability of a 403 quotaExceeded per call")
+    parser.add_argument('--max-videos', type=int, default=10)
+    parser.add_argument('--max-comments', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=50, help="warm requests per endpoint")
+    parser.add_argument('--refetch-iterations', type=int, default=5, help="requests per endpoint after dropping the caches")
+    parser.add_argument('--sentiment-comments', type=int, default=20000)
+    parser.add_argument('--label', default='', help="free-form label stored with the results")
+    parser.add_argument('--output', help="results file (default: bench/results/<timestamp>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    api = FakeYouTube(args.videos, args.comments, args.latency_ms, args.quota_units, args.quota_error_rate)
+    server, base_url = serve(api)
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    app = configure_app(base_url, workdir)
+
+    query = f"max_videos={args.max_videos}&max_comments={args.max_comments}"
+    first_video = api.channel_videos(app.CHANNEL_ID)[0]['id']
+    urls = {
+        'chart-data': f"/api/chart-data?{query}",
+        'sentiment-data': f"/api/sentiment-data?max_videos={min(args.max_videos, 10)}&max_comments={min(args.max_comments, 50)}",
+        'video-details': f"/api/video-details/{first_video}?max_comments=100"
+    }
+
+    started = time.perf_counter()
+    endpoints = bench_endpoints(app, urls, args.iterations, args.refetch_iterations)
+    sentiment = bench_sentiment(args.sentiment_comments)
+    memory = bench_memory(app, urls['chart-data'])
+    server.shutdown()
+
+    commit = git_commit()
+    created_at = datetime.now(timezone.utc)
+    results = {
+        'schema': SCHEMA_VERSION,
+        'label': args.label,
+        'created_at': created_at.isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {name: value for name, value in vars(args).items() if name not in ('output', 'label')},
+        'endpoints': endpoints,
+        'sentiment_service': sentiment,
+        'memory': memory,
+        'upstream': api.stats(),
+        'duration_s': round(time.perf_counter() - started, 2)
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{created_at.strftime('%Y%m%dT%H%M%SZ')}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    for name, result in endpoints.items():
+        print(f"{name:15} cold {result['cold_ms']:9.1f} ms   warm p50 {result['warm']['p50_ms']:8.2f} ms  "
+              f"p95 {result['warm']['p95_ms']:8.2f} ms   refetch p50 {result['refetch'].get('p50_ms', 0):8.1f} ms")
+    print(f"SentimentService {sentiment['unique']['comments_per_sec']:,.0f} comments/s "
+          f"({sentiment['repeated']['comments_per_sec']:,.0f} repeated)")
+    print(f"Peak RSS {memory['peak_rss_mb']} MB, traced heap peak {memory['traced_peak_mb']} MB")
+    print(f"Upstream {api.stats()}")
+    print(f"Results written to {output}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+import glob
+import os
+import tempfile
+
+# Workers write their metric samples to this directory so /metrics can sum
+# them over all workers; it must be set before the workers import the app
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), "dashboard-metrics")
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(path, exist_ok=True)
+    # Samples left by a previous run would otherwise be added to this one
+    for file in glob.glob(os.path.join(path, "*.db")):
+        os.remove(file)
+
+
+def child_exit(server, worker):
+    from services.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
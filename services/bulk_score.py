@@ -0,0 +1,140 @@
+"""Score archived comment dumps offline.
+
+Reads a JSONL or CSV file of comments (author, comment, date, likeCount)
+and writes the same rows with polarity, subjectivity and label added.
+Chunks are streamed through a process pool, so memory stays bounded by the
+number of chunks in flight rather than the size of the dump.
+
+Usage:
+    python -m services.bulk_score comments.jsonl scored.jsonl
+    python -m services.bulk_score comments.csv scored.csv --workers 8 --chunk-size 5000
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from services.comment_processor import SentimentService
+
+SCORE_FIELDS = ['polarity', 'subjectivity', 'label']
+
+
+def detect_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(path, fmt):
+    """Yield comment rows from a JSONL or CSV file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_chunks(rows, chunk_size):
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+_service = None
+
+
+def score_chunk(rows):
+    """Add polarity, subjectivity and label to a chunk of rows (runs in a worker)"""
+    global _service
+    if _service is None:
+        _service = SentimentService()
+    scores = _service.analyze_batch([str(row.get('comment') or '') for row in rows])
+    for row, score in zip(rows, scores):
+        row['polarity'] = round(score['polarity'], 4)
+        row['subjectivity'] = round(score['subjectivity'], 4)
+        row['label'] = score['classification']
+    return rows
+
+
+class RowWriter:
+    def __init__(self, f, fmt):
+        self.f = f
+        self.fmt = fmt
+        self.csv_writer = None
+
+    def write(self, rows):
+        if self.fmt == 'jsonl':
+            self.f.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+            return
+        if self.csv_writer is None:
+            fieldnames = [key for key in rows[0] if key not in SCORE_FIELDS] + SCORE_FIELDS
+            self.csv_writer = csv.DictWriter(self.f, fieldnames=fieldnames, extrasaction='ignore')
+            self.csv_writer.writeheader()
+        self.csv_writer.writerows(rows)
+
+
+def score_file(input_path, output_path, workers=None, chunk_size=2000, input_format=None, output_format=None):
+    """Score every comment in input_path into output_path, returning the row count"""
+    workers = workers or os.cpu_count() or 1
+    input_format = input_format or detect_format(input_path)
+    output_format = output_format or detect_format(output_path)
+    chunks = iter_chunks(read_rows(input_path, input_format), chunk_size)
+    total = 0
+
+    with open(output_path, 'w', newline='', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        writer = RowWriter(out, output_format)
+        # Keep a bounded window of chunks in flight and write them back in input order
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(score_chunk, chunk))
+            if len(pending) >= workers * 2:
+                rows = pending.popleft().result()
+                writer.write(rows)
+                total += len(rows)
+        while pending:
+            rows = pending.popleft().result()
+            writer.write(rows)
+            total += len(rows)
+
+    return total
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Get the peak RSS in MB of this process, or with RUSAGE_CHILDREN of its largest child"""
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(who).ru_maxrss / scale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL or CSV dump of comments offline")
+    parser.add_argument('input', help="input file (.jsonl or .csv)")
+    parser.add_argument('output', help="output file (.jsonl or .csv)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="comments per chunk sent to a worker")
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'], help="override format detected from the extension")
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'], help="override format detected from the extension")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    total = score_file(args.input, args.output, args.workers, max(args.chunk_size, 1),
+                       args.input_format, args.output_format)
+    elapsed = time.perf_counter() - start
+    parent_rss, worker_rss = peak_rss_mb(), peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+    print(f"Scored {total} comments in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} comments/sec)")
+    print(f"Peak RSS: {parent_rss:.1f} MB main process, {worker_rss:.1f} MB largest worker")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class CommentStore:
+    """Persistent SQLite store of scored comments keyed by comment id.
+
+    Each video keeps a high-water mark (the newest comment timestamp seen) so
+    a refresh only has to fetch comments published after it, and stored
+    sentiment is reused instead of scoring old comments again. Like counts of
+    stored comments are not refreshed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS comments (
+                    comment_id TEXT PRIMARY KEY,
+                    video_id TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    comment TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    like_count INTEGER NOT NULL DEFAULT 0,
+                    sentiment TEXT NOT NULL,
+                    author_profile_image_url TEXT NOT NULL DEFAULT '',
+                    polarity REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(comments)')}
+            if 'polarity' not in columns:
+                # Stores created before polarity was kept report 0 for old comments
+                self._conn.execute('ALTER TABLE comments ADD COLUMN polarity REAL NOT NULL DEFAULT 0')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_video_date ON comments (video_id, date DESC)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_comments_date ON comments (date DESC)')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY,
+                    newest_seen TEXT,
+                    complete INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL,
+                    comment_count INTEGER
+                )
+            ''')
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(videos)')}
+            if 'comment_count' not in columns:
+                self._conn.execute('ALTER TABLE videos ADD COLUMN comment_count INTEGER')
+
+    def get_video_state(self, video_id):
+        """Get the high-water mark, completeness flag, stored comment count and
+        last seen YouTube commentCount of a video, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT newest_seen, complete, comment_count FROM videos WHERE video_id = ?', (video_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            count = self._conn.execute(
+                'SELECT COUNT(*) FROM comments WHERE video_id = ?', (video_id,)
+            ).fetchone()[0]
+            return {
+                'newest_seen': row['newest_seen'],
+                'complete': bool(row['complete']),
+                'count': count,
+                'comment_count': row['comment_count']
+            }
+
+    def get_sentiments(self, video_id):
+        """Get stored (label, polarity) pairs of a video keyed by comment id"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT comment_id, sentiment, polarity FROM comments WHERE video_id = ?', (video_id,)
+            ).fetchall()
+            return {row['comment_id']: (row['sentiment'], row['polarity']) for row in rows}
+
+    def save_comments(self, video_id, comments, complete=None):
+        """Insert or update scored comments and advance the video's high-water mark.
+
+        `complete` marks whether the stored comments reach back to the oldest
+        comment of the video; None leaves the flag unchanged.
+        """
+        newest = max((comment['date'] for comment in comments), default=None)
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT INTO comments (comment_id, video_id, author, comment, date, like_count, sentiment, author_profile_image_url, polarity)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(comment_id) DO UPDATE SET like_count = excluded.like_count
+            ''', [
+                (comment['id'], video_id, comment['author'], comment['comment'], comment['date'],
+                 comment['likeCount'], comment['sentiment'], comment.get('authorProfileImageUrl', ''),
+                 comment.get('polarity', 0.0))
+                for comment in comments
+            ])
+            self._conn.execute('''
+                INSERT INTO videos (video_id, newest_seen, complete, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    newest_seen = MAX(COALESCE(videos.newest_seen, ''), COALESCE(excluded.newest_seen, '')),
+                    complete = COALESCE(?, videos.complete),
+                    updated_at = excluded.updated_at
+            ''', (video_id, newest, int(bool(complete)), datetime.now().isoformat(),
+                  None if complete is None else int(complete)))
+
+    def set_comment_count(self, video_id, comment_count):
+        """Record the commentCount YouTube reported when the video was last fetched"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE videos SET comment_count = ? WHERE video_id = ?', (comment_count, video_id)
+            )
+
+    def get_comments(self, video_id, limit=None):
+        """Get stored comments of a video, newest first"""
+        query = '''
+            SELECT comment_id, author, comment, date, like_count, sentiment, polarity, author_profile_image_url
+            FROM comments WHERE video_id = ? ORDER BY date DESC, rowid ASC
+        '''
+        params = (video_id,)
+        if limit:
+            query += ' LIMIT ?'
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                'id': row['comment_id'],
+                'author': row['author'],
+                'comment': row['comment'],
+                'date': row['date'],
+                'likeCount': row['like_count'],
+                'sentiment': row['sentiment'],
+                'polarity': row['polarity'],
+                'authorProfileImageUrl': row['author_profile_image_url']
+            }
+            for row in rows
+        ]
+
+    def iter_comments(self, video_ids=None, published_after=None, published_before=None, sentiments=None, batch_size=1000):
+        """Yield stored comments matching the filters, newest first.
+
+        Rows are read in keyset-paginated batches of `batch_size` and the lock is
+        only held while a batch is read, so memory stays constant and writers are
+        not blocked however many comments are exported. `published_after` is
+        exclusive and `published_before` inclusive, both compared as ISO 8601 strings.
+        """
+        conditions = []
+        params = []
+        if video_ids:
+            conditions.append(f"video_id IN ({', '.join('?' * len(video_ids))})")
+            params.extend(video_ids)
+        if published_after:
+            conditions.append('date > ?')
+            params.append(published_after)
+        if published_before:
+            conditions.append('date <= ?')
+            params.append(published_before)
+        if sentiments:
+            conditions.append(f"sentiment IN ({', '.join('?' * len(sentiments))})")
+            params.extend(sentiments)
+
+        last = None
+        while True:
+            where = list(conditions)
+            page_params = list(params)
+            if last is not None:
+                where.append('(date < ? OR (date = ? AND rowid < ?))')
+                page_params.extend([last['date'], last['date'], last['rowid']])
+            query = f'''
+                SELECT rowid, comment_id, video_id, author, comment, date, like_count, sentiment, polarity
+                FROM comments WHERE {' AND '.join(where) or '1'}
+                ORDER BY date DESC, rowid DESC LIMIT ?
+            '''
+            with self._lock:
+                rows = self._conn.execute(query, page_params + [batch_size]).fetchall()
+
+            for row in rows:
+                yield {
+                    'id': row['comment_id'],
+                    'video_id': row['video_id'],
+                    'author': row['author'],
+                    'comment': row['comment'],
+                    'date': row['date'],
+                    'likeCount': row['like_count'],
+                    'sentiment': row['sentiment'],
+                    'polarity': row['polarity']
+                }
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
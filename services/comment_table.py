@@ -0,0 +1,188 @@
+import calendar
+import time
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+SENTIMENT_CODES = {sentiment: code for code, sentiment in enumerate(SENTIMENTS)}
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+SORT_FIELDS = ('date', 'likes')
+# Types of the parts of sort_key for each sort field
+SORT_KEY_TYPES = {'date': (int, str), 'likes': (int, int, str)}
+MAX_INT32 = 2 ** 31 - 1
+
+
+def parse_date(date):
+    """Get the epoch seconds of an API timestamp"""
+    try:
+        return calendar.timegm(time.strptime(date, DATE_FORMAT))
+    except ValueError:
+        # Timestamps with fractions or offsets lose sub-second precision
+        return int(datetime.fromisoformat(date.replace('Z', '+00:00')).timestamp())
+
+
+class CommentTable:
+    """Columnar table of scored comments.
+
+    Comments are stored as parallel arrays instead of one dict each: dates as
+    epoch seconds, likes as int32, sentiment as int8 codes, polarity as
+    float32 and a video index, with author names and avatar URLs interned in
+    a shared string pool. Rows are only turned back into dicts by the views,
+    when they are read or serialized.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.texts = []
+        self.video_index = array('I')
+        self.dates = array('q')
+        self.likes = array('i')
+        self.sentiments = array('b')
+        self.polarities = array('f')
+        self.authors = array('I')
+        self.avatars = array('I')
+        self.video_ids = []
+        self._video_positions = {}
+        self.strings = []
+        self._string_positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _intern(self, value):
+        position = self._string_positions.get(value)
+        if position is None:
+            position = self._string_positions[value] = len(self.strings)
+            self.strings.append(value)
+        return position
+
+    def extend(self, video_id, comments):
+        """Append the comments of a video, returning a view of the new rows"""
+        video = self._video_positions.get(video_id)
+        if video is None:
+            video = self._video_positions[video_id] = len(self.video_ids)
+            self.video_ids.append(video_id)
+
+        start = len(self.ids)
+        for comment in comments:
+            self.ids.append(comment.get('id'))
+            self.texts.append(comment['comment'])
+            self.video_index.append(video)
+            self.dates.append(parse_date(comment['date']))
+            self.likes.append(min(comment.get('likeCount', 0), MAX_INT32))
+            self.sentiments.append(SENTIMENT_CODES[comment['sentiment']])
+            self.polarities.append(comment.get('polarity') or 0.0)
+            self.authors.append(self._intern(comment['author']))
+            self.avatars.append(self._intern(comment.get('authorProfileImageUrl', '')))
+        return CommentView(self, array('I', range(start, len(self.ids))))
+
+    def row(self, i):
+        """Materialize row i as a comment dict"""
+        return {
+            'id': self.ids[i],
+            'author': self.strings[self.authors[i]],
+            'comment': self.texts[i],
+            'date': time.strftime(DATE_FORMAT, time.gmtime(self.dates[i])),
+            'likeCount': self.likes[i],
+            'sentiment': SENTIMENTS[self.sentiments[i]],
+            'polarity': round(self.polarities[i], 4),
+            'authorProfileImageUrl': self.strings[self.avatars[i]]
+        }
+
+    def video_id(self, i):
+        return self.video_ids[self.video_index[i]]
+
+    def sort_key(self, field, i):
+        """Get the key of row i when sorting by field, newest or most liked last"""
+        if field == 'likes':
+            return (self.likes[i], self.dates[i], self.ids[i] or '')
+        return (self.dates[i], self.ids[i] or '')
+
+
+class CommentView(Sequence):
+    """Read-only sequence of rows of a CommentTable.
+
+    Behaves like a list of comment dicts, but slicing and concatenation only
+    copy row numbers, and counts are computed from the columns without
+    materializing any dict.
+    """
+
+    __slots__ = ('table', 'rows')
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+
+    @classmethod
+    def concat(cls, views):
+        """Join views of the same table into one"""
+        rows = array('I')
+        for view in views:
+            rows.extend(view.rows)
+        return cls(views[0].table if views else CommentTable(), rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return CommentView(self.table, self.rows[item])
+        return self.table.row(self.rows[item])
+
+    def __iter__(self):
+        row = self.table.row
+        for i in self.rows:
+            yield row(i)
+
+    def sentiment_counts(self):
+        counts = [0] * len(SENTIMENTS)
+        sentiments = self.table.sentiments
+        for i in self.rows:
+            counts[sentiments[i]] += 1
+        return dict(zip(SENTIMENTS, counts))
+
+    def total_likes(self):
+        likes = self.table.likes
+        return sum(likes[i] for i in self.rows)
+
+    def to_list(self):
+        return list(self)
+
+    def sorted_by(self, field):
+        """Get the rows sorted by field ('date' or 'likes'), newest or most liked first"""
+        if field not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+        return CommentView(self.table, array('I', sorted(self.rows, key=lambda i: self.table.sort_key(field, i), reverse=True)))
+
+    def page(self, field, after=None, limit=None):
+        """Get (rows, key of the last row or None) of a page of a view sorted by field.
+
+        `after` is the key returned for the previous page; the returned key is
+        None when there are no more rows.
+        """
+        rows = self.rows
+        if after is not None:
+            after = tuple(after)
+            start = next((n for n, i in enumerate(rows) if self.table.sort_key(field, i) < after), len(rows))
+            rows = rows[start:]
+        if limit is None or len(rows) <= limit:
+            return CommentView(self.table, rows), None
+        rows = rows[:limit]
+        return CommentView(self.table, rows), self.table.sort_key(field, rows[-1])
+
+
+def to_comment_view(comments):
+    """Get a view of a list of comment dicts (views are returned as they are)"""
+    if isinstance(comments, CommentView):
+        return comments
+    return CommentTable().extend(None, comments)
+
+
+def to_comment_table(videos, comments_by_video):
+    """Get comment views of each video, backed by one table"""
+    table = CommentTable()
+    return {
+        video['videoId']: table.extend(video['videoId'], comments_by_video.get(video['videoId']) or [])
+        for video in videos
+    }
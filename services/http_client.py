@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.metrics import UPSTREAM_REQUEST_SECONDS
+from services.profiling import span
+from services.upstream_cache import UPSTREAM_CACHE_DIR, UPSTREAM_CACHE_MODE, UpstreamResponseCache
+
+# Size the connection pool to the number of concurrent fetch workers
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", os.getenv("FETCH_WORKERS", "8")))
+UPSTREAM_TIMEOUT = int(os.getenv("UPSTREAM_TIMEOUT", "30"))
+# Base URL of the YouTube Data API; point it at a local stand-in to run offline
+YOUTUBE_API_BASE_URL = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3").rstrip('/')
+
+
+class UpstreamClient:
+    """Pooled keep-alive HTTP client for the YouTube Data API.
+
+    Reusing one session keeps TCP+TLS connections to googleapis.com open
+    between calls. Per-endpoint call counts and timings are recorded, and
+    responses go through the disk cache when UPSTREAM_CACHE_DIR is set.
+    """
+
+    def __init__(self, pool_size=UPSTREAM_POOL_SIZE, timeout=UPSTREAM_TIMEOUT, cache_dir=UPSTREAM_CACHE_DIR,
+                 cache_mode=UPSTREAM_CACHE_MODE):
+        self.timeout = timeout
+        self.cache = UpstreamResponseCache(cache_dir, cache_mode) if cache_dir else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 1))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Google APIs only gzip responses when the user agent also mentions gzip
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip',
+            'User-Agent': 'car-sentiment-dashboard (gzip)'
+        })
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None, key_label=None, **kwargs):
+        """Send a GET request over the pooled session, through the response cache if enabled.
+
+        `key_label` names the API key in the request metrics. Responses answered from
+        the cache without calling the API have from_cache set.
+        """
+        if self.cache is None:
+            return self._send(url, params, timeout, key_label, **kwargs)
+        headers = kwargs.pop('headers', None) or {}
+        return self.cache.get(
+            lambda conditional: self._send(url, params, timeout, key_label, headers={**headers, **conditional}, **kwargs),
+            url, params)
+
+    def _send(self, url, params=None, timeout=None, key_label=None, **kwargs):
+        endpoint = urlparse(url).path.rsplit('/', 1)[-1] or url
+        start = time.perf_counter()
+        failed = True
+        try:
+            with span(f"youtube.{endpoint}"):
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+            failed = response.status_code >= 400
+            response.from_cache = False
+            return response
+        finally:
+            self._record(endpoint, key_label, time.perf_counter() - start, failed)
+
+    def _record(self, endpoint, key_label, elapsed, failed):
+        UPSTREAM_REQUEST_SECONDS.labels(endpoint, key_label or 'none').observe(elapsed)
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            stats['errors'] += int(failed)
+            stats['total_ms'] += elapsed * 1000
+            stats['max_ms'] = max(stats['max_ms'], elapsed * 1000)
+
+    def stats(self):
+        """Get per-endpoint call counts and latency"""
+        with self._lock:
+            return {
+                endpoint: {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['total_ms'] / stats['calls'], 2) if stats['calls'] else 0,
+                    'max_ms': round(stats['max_ms'], 2),
+                    'total_ms': round(stats['total_ms'], 2)
+                }
+                for endpoint, stats in self._stats.items()
+            }
+
+    def cache_stats(self):
+        """Get the response cache counters, or None when it is disabled"""
+        return self.cache.stats() if self.cache is not None else None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_upstream_client():
+    """Get the process-wide shared upstream client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = UpstreamClient()
+        return _client
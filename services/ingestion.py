@@ -0,0 +1,219 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from services.comment_processor import SentimentService
+from services.comment_table import to_comment_table
+from services.quota import QuotaScheduler
+from services.rollups import SentimentRollup
+from services.youtube_service import YouTubeService
+
+logger = logging.getLogger(__name__)
+
+# (event loop, concurrency limit, rate limiter per API key) of the crawl running in this context
+_crawl_limits = contextvars.ContextVar('crawl_limits', default=None)
+
+
+class AsyncRateLimiter:
+    """Token bucket allowing `rate` calls per second with bursts of `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MultiChannelIngestor:
+    """Asyncio engine that crawls many channels concurrently.
+
+    Channels are taken from a queue by a fixed number of workers. Service
+    calls share a global concurrency limit, and every HTTP request they make
+    picks its key through the shared QuotaScheduler (which charges it and
+    cools down keys that hit quota errors) and first takes a token from that
+    key's rate limiter. In-flight work is therefore bounded by the limits,
+    not by the number of channels.
+    Each channel's latest result is kept as a snapshot in the same shape as
+    the dashboard's own, together with its sentiment rollups.
+    The limits belong to one crawl and reach the executor threads through the
+    context each blocking call runs in, so crawls on different event loops do
+    not share them.
+    """
+
+    def __init__(self, api_keys, max_concurrency=8, channel_workers=4, calls_per_second=5,
+                 max_videos=20, max_comments=100, days=30, score_batch=None, quota=None):
+        self.quota = quota or QuotaScheduler(api_keys)
+        self.client = YouTubeService(quota=self.quota, throttle=self._throttle)
+        self.max_concurrency = max_concurrency
+        self.channel_workers = channel_workers
+        self.calls_per_second = calls_per_second
+        self.max_videos = max_videos
+        self.max_comments = max_comments
+        self.days = days
+        self.score_batch = score_batch or self._score_with_sentiment_service
+        self.snapshots = {}
+        self.rollups = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='channel-ingestor')
+
+    @staticmethod
+    def _score_with_sentiment_service(texts):
+        scores = SentimentService().analyze_batch(texts)
+        return [(round(score['polarity'], 4), score['classification']) for score in scores]
+
+    async def crawl(self, channel_ids):
+        """Crawl every channel once, returning the ids that succeeded"""
+        if not self.quota.api_keys:
+            logger.error("No API keys configured for multi-channel ingestion")
+            return []
+
+        limits_token = _crawl_limits.set((
+            asyncio.get_running_loop(),
+            asyncio.Semaphore(self.max_concurrency),
+            {key: AsyncRateLimiter(self.calls_per_second) for key in self.quota.api_keys}
+        ))
+
+        queue = asyncio.Queue()
+        for channel_id in channel_ids:
+            queue.put_nowait(channel_id)
+        done = []
+
+        async def worker():
+            while True:
+                try:
+                    channel_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self.crawl_channel(channel_id)
+                    done.append(channel_id)
+                except Exception as e:
+                    with self._lock:
+                        self.errors[channel_id] = str(e)
+                    logger.error(f"Error ingesting channel {channel_id}: {e}")
+                finally:
+                    queue.task_done()
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.channel_workers, len(channel_ids)))))
+        finally:
+            _crawl_limits.reset(limits_token)
+        return done
+
+    async def _call(self, method, *args, **kwargs):
+        """Run a blocking YouTubeService call under the global concurrency limit"""
+        _, semaphore, _ = _crawl_limits.get()
+        async with semaphore:
+            return await self._run_blocking(getattr(self.client, method), *args, **kwargs)
+
+    def _throttle(self, key):
+        """Wait for a token of the key's rate limiter; called from executor threads before each request"""
+        limits = _crawl_limits.get()
+        if limits is None:
+            return
+        loop, _, limiters = limits
+        asyncio.run_coroutine_threadsafe(limiters[key].acquire(), loop).result()
+
+    async def _run_blocking(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # In a copy of the crawl's context, so _throttle finds the crawl's limiters
+        return await loop.run_in_executor(self._executor, functools.partial(contextvars.copy_context().run, fn, *args, **kwargs))
+
+    async def crawl_channel(self, channel_id):
+        """Fetch, score and store the latest snapshot of one channel"""
+        published_after = (datetime.now(timezone.utc) - timedelta(days=self.days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        videos = await self._call('get_latest_videos', channel_id, self.max_videos, published_after=published_after)
+
+        async def fetch(video):
+            try:
+                comments = await self._call('get_video_comments', video['videoId'], self.max_comments)
+            except Exception as e:
+                logger.warning(f"Error fetching comments for video {video['videoId']}: {e}")
+                return []
+            scores = await self._run_blocking(self.score_batch, [comment['comment'] for comment in comments])
+            for comment, (polarity, label) in zip(comments, scores):
+                comment['comment'] = comment['comment'][:500]
+                comment['sentiment'] = label
+                comment['polarity'] = polarity
+            return comments
+
+        results = await asyncio.gather(*(fetch(video) for video in videos))
+        for video in videos:
+            video['description'] = video.get('description', '')[:200]
+
+        with self._lock:
+            rollup = self.rollups.setdefault(channel_id, SentimentRollup())
+        for video, comments in zip(videos, results):
+            rollup.ingest(video['videoId'], comments)
+
+        snapshot = {
+            'videos': videos,
+            'comments': to_comment_table(videos, {video['videoId']: comments for video, comments in zip(videos, results)}),
+            'fetched_at': datetime.now().isoformat(),
+            'fetched_ts': time.time()
+        }
+        with self._lock:
+            self.snapshots[channel_id] = snapshot
+            self.errors.pop(channel_id, None)
+        logger.info(f"Ingested {sum(len(c) for c in results)} comments from {len(videos)} videos of channel {channel_id}")
+        return snapshot
+
+    def get_snapshot(self, channel_id):
+        with self._lock:
+            return self.snapshots.get(channel_id)
+
+    def get_rollup(self, channel_id):
+        with self._lock:
+            return self.rollups.get(channel_id)
+
+    def start(self, channel_ids, interval=300):
+        """Crawl the channels every `interval` seconds in a background event loop, started once"""
+        if not channel_ids:
+            return
+
+        async def run_forever():
+            while True:
+                start = time.monotonic()
+                done = await self.crawl(channel_ids)
+                logger.info(f"Crawled {len(done)}/{len(channel_ids)} channels in {time.monotonic() - start:.1f}s")
+                await asyncio.sleep(interval)
+
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=asyncio.run, args=(run_forever(),), name='channel-ingestor', daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'channels': {
+                    channel_id: {
+                        'videos': len(snapshot['videos']),
+                        'comments': sum(len(comments) for comments in snapshot['comments'].values()),
+                        'age': round(time.time() - snapshot['fetched_ts'], 1)
+                    }
+                    for channel_id, snapshot in self.snapshots.items()
+                },
+                'errors': dict(self.errors)
+            }
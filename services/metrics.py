@@ -0,0 +1,83 @@
+import logging
+import os
+
+try:
+    import prometheus_client
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client import multiprocess
+except ImportError:  # Optional; metrics are then not collected and /metrics is unavailable
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+# Set by gunicorn.conf.py before the workers start; each worker then writes its
+# samples to files in this directory and /metrics sums them over all workers
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+class _NoopMetric:
+    """Stand-in for a metric when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+
+def _metric(cls_name, name, documentation, labelnames=(), **kwargs):
+    if prometheus_client is None:
+        return _NoopMetric()
+    cls = Counter if cls_name == 'counter' else Histogram
+    return cls(name, documentation, labelnames, **kwargs)
+
+
+HTTP_REQUEST_SECONDS = _metric(
+    'histogram', 'dashboard_http_request_duration_seconds', "Time to handle a Flask request, by route",
+    ('route', 'method', 'status'), buckets=LATENCY_BUCKETS)
+UPSTREAM_REQUEST_SECONDS = _metric(
+    'histogram', 'dashboard_youtube_request_duration_seconds', "Time of YouTube Data API calls, by endpoint and API key",
+    ('endpoint', 'key'), buckets=LATENCY_BUCKETS)
+UPSTREAM_CALLS = _metric(
+    'counter', 'dashboard_youtube_calls', "YouTube Data API calls by endpoint, API key and outcome",
+    ('endpoint', 'key', 'outcome'))
+QUOTA_ERRORS = _metric(
+    'counter', 'dashboard_youtube_quota_errors', "403 quota errors by API key and kind (quota or rate_limit)",
+    ('key', 'kind'))
+KEY_ROTATIONS = _metric(
+    'counter', 'dashboard_youtube_key_rotations', "Switches to another API key after a quota error")
+SENTIMENT_BATCH_SECONDS = _metric(
+    'histogram', 'dashboard_sentiment_batch_duration_seconds', "Time to score a batch of comments",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+SENTIMENT_COMMENTS = _metric(
+    'counter', 'dashboard_sentiment_comments', "Comments scored, by whether the memo already had them",
+    ('source',))
+CACHE_LOOKUPS = _metric(
+    'counter', 'dashboard_cache_lookups', "Cache lookups by cache and result (hit or miss)", ('cache', 'result'))
+
+
+def record_cache(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def render_metrics():
+    """Get (body, content type) of the metrics of every worker in the Prometheus text format, or None"""
+    if prometheus_client is None:
+        return None
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drop the live-only samples of a worker that exited (its counters are kept)"""
+    if prometheus_client is not None and PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
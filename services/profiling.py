@@ -0,0 +1,160 @@
+import contextvars
+import hmac
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated tokens allowed to turn on profiling; empty disables it
+PROFILE_TOKENS = [token.strip() for token in os.getenv("PROFILE_TOKENS", "").split(",") if token.strip()]
+# Header carrying the token, optionally followed by ";sample" for a sampling profile
+PROFILE_HEADER = "X-Profile"
+# Directory the sampling profiles are written to
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+_current = contextvars.ContextVar('request_profile', default=None)
+_NO_SPAN = nullcontext()
+
+
+def parse_profile_header(value):
+    """Get (allowed, sample) for the value of the profiling header"""
+    token, *options = [part.strip() for part in value.split(';')]
+    allowed = any(hmac.compare_digest(token, candidate) for candidate in PROFILE_TOKENS)
+    return allowed, 'sample' in options
+
+
+class StackSampler:
+    """Samples the stacks of the profiled threads at a fixed interval.
+
+    Stacks are counted in the folded format (`thread;module:function;... count`)
+    read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, threads, interval=PROFILE_SAMPLE_INTERVAL):
+        self.threads = threads
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident not in self.threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """Timed spans of one request, across the threads working on it"""
+
+    def __init__(self, name, sample=False):
+        self.id = secrets.token_hex(6)
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_ms = None
+        self.spans = []  # (name, start_ms, duration_ms, thread name)
+        self.threads = {threading.get_ident()}
+        self._lock = threading.Lock()
+        self.sampler = StackSampler(self.threads) if sample else None
+
+    @contextmanager
+    def span(self, name):
+        self.threads.add(threading.get_ident())
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.spans.append((name, (start - self.started) * 1000, (end - start) * 1000,
+                                   threading.current_thread().name))
+
+    def finish(self):
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def summary(self):
+        """Get {span name: {count, total_ms, max_ms}} in the order the spans were first seen"""
+        totals = {}
+        with self._lock:
+            for name, _, duration, _ in self.spans:
+                total = totals.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                total['count'] += 1
+                total['total_ms'] += duration
+                total['max_ms'] = max(total['max_ms'], duration)
+        return {name: {key: round(value, 2) for key, value in total.items()} for name, total in totals.items()}
+
+    def server_timing(self):
+        """Get the Server-Timing header value; spans of parallel threads may add up to more than the total"""
+        metrics = [f'{name};dur={total["total_ms"]};desc="{total["count"]}x"' for name, total in self.summary().items()]
+        return ', '.join(metrics + [f"total;dur={round(self.wall_ms, 2)}"])
+
+    def to_dict(self):
+        with self._lock:
+            spans = [{'name': name, 'start_ms': round(start, 2), 'duration_ms': round(duration, 2), 'thread': thread}
+                     for name, start, duration, thread in self.spans]
+        return {
+            'id': self.id,
+            'request': self.name,
+            'wall_ms': round(self.wall_ms, 2) if self.wall_ms is not None else None,
+            'summary': self.summary(),
+            'spans': spans
+        }
+
+    def dump(self, path=PROFILE_DIR):
+        """Write the spans and the sampled stacks to PROFILE_DIR, returning the folded stack file"""
+        try:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, f"{self.id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            folded_path = os.path.join(path, f"{self.id}.folded")
+            with open(folded_path, 'w', encoding='utf-8') as f:
+                f.write(self.sampler.folded())
+            return folded_path
+        except Exception as e:
+            logger.error(f"Error writing profile {self.id}: {e}")
+            return None
+
+
+def start_profile(name, sample=False):
+    """Start profiling the current request, returning (profile, token to pass to end_profile)"""
+    profile = RequestProfile(name, sample)
+    return profile, _current.set(profile)
+
+
+def end_profile(token):
+    _current.reset(token)
+
+
+def span(name):
+    """Time a block as part of the current request's profile; a no-op when it is not profiled"""
+    profile = _current.get()
+    if profile is None:
+        return _NO_SPAN
+    return profile.span(name)
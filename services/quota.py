@@ -0,0 +1,218 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; state is then merged without a file lock
+    fcntl = None
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except Exception:
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API v3 quota cost per call, by endpoint
+QUOTA_COSTS = {
+    'search': 100,
+    'commentThreads': 1,
+    'videos': 1,
+    'channels': 1,
+    'playlistItems': 1
+}
+
+# 403 reasons that mean the key itself is out of quota until the daily reset,
+# and those that only throttle it for seconds to minutes (others, such as
+# commentsDisabled, are specific to the request)
+DAILY_LIMIT_REASONS = ('quotaExceeded', 'dailyLimitExceeded')
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+QUOTA_ERROR_REASONS = DAILY_LIMIT_REASONS + RATE_LIMIT_REASONS
+
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+QUOTA_STATE_PATH = os.getenv("QUOTA_STATE_PATH", "quota_state.json")
+# Cooldown (seconds) of a rate-limited key, doubled on each repeated rate limit up to the maximum
+RATE_LIMIT_COOLDOWN = float(os.getenv("RATE_LIMIT_COOLDOWN", "5"))
+RATE_LIMIT_MAX_COOLDOWN = float(os.getenv("RATE_LIMIT_MAX_COOLDOWN", "300"))
+
+
+def quota_error_kind(error):
+    """Get 'quota' or 'rate_limit' for a YouTube API error that is about the key itself, else None"""
+    reasons = [item.get('reason') for item in error.get('errors', [])]
+    if reasons and not any(reason in QUOTA_ERROR_REASONS for reason in reasons):
+        return None
+    # Without a reason, assume quota as the API did not say otherwise
+    if reasons and not any(reason in DAILY_LIMIT_REASONS for reason in reasons):
+        return 'rate_limit'
+    return 'quota'
+
+
+def quota_day(now=None):
+    """Get the current quota day; YouTube quotas reset at midnight Pacific Time"""
+    return (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE).strftime('%Y-%m-%d')
+
+
+def next_reset(now=None):
+    now = (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE)
+    return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class QuotaScheduler:
+    """Quota-aware API key scheduler.
+
+    Tracks estimated units spent per key per quota day, picks the key with
+    the most remaining budget before each call, and keeps keys that hit a
+    quota error in cooldown until the daily reset. Rate-limited keys only get
+    a short in-process cooldown with exponential backoff. State is persisted to a
+    JSON file (keys are stored as hashes) and merged with the spending of
+    other worker processes on every flush.
+    """
+
+    def __init__(self, api_keys, daily_quota=DAILY_QUOTA, path=QUOTA_STATE_PATH, flush_interval=30):
+        self.api_keys = [key for key in api_keys if key]
+        self.daily_quota = daily_quota
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._ids = {key: hashlib.sha256(key.encode('utf-8')).hexdigest()[:12] for key in self.api_keys}
+        self._day = quota_day()
+        self._used = {key: 0 for key in self.api_keys}
+        self._exhausted = set()
+        self._throttled = {}  # key -> (cooldown ends at, in time.monotonic(); current cooldown)
+        self._pending = {key: 0 for key in self.api_keys}
+        self._last_flush = time.monotonic()
+        if path:
+            self.flush()
+            atexit.register(self.flush)
+
+    def _roll_day(self):
+        day = quota_day()
+        if day != self._day:
+            logger.info(f"Quota day rolled over to {day}; resetting key budgets")
+            self._day = day
+            self._used = {key: 0 for key in self.api_keys}
+            self._exhausted.clear()
+            self._pending = {key: 0 for key in self.api_keys}
+
+    def remaining(self, key):
+        with self._lock:
+            self._roll_day()
+            return 0 if key in self._exhausted else max(self.daily_quota - self._used.get(key, 0), 0)
+
+    def pick_key(self, cost=1):
+        """Get the available key with the most remaining budget, or None if none can afford cost"""
+        with self._lock:
+            self._roll_day()
+            now = time.monotonic()
+            candidates = [
+                key for key in self.api_keys
+                if key not in self._exhausted and self.daily_quota - self._used[key] >= cost
+                and self._throttled.get(key, (0, 0))[0] <= now
+            ]
+            if not candidates:
+                return None
+            return max(candidates, key=lambda key: self.daily_quota - self._used[key])
+
+    def charge(self, key, cost):
+        """Record units spent by a call made with key"""
+        with self._lock:
+            self._roll_day()
+            if key not in self._used:
+                return
+            self._used[key] += cost
+            self._pending[key] += cost
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def mark_exhausted(self, key):
+        """Put a key in cooldown until the next quota reset"""
+        with self._lock:
+            self._roll_day()
+            if key not in self._used or key in self._exhausted:
+                return
+            self._exhausted.add(key)
+            logger.warning(f"API {self.key_label(key)} is out of quota until {next_reset().isoformat()}")
+        self.flush()
+
+    def mark_throttled(self, key):
+        """Put a rate-limited key in a short cooldown, doubling it while the key keeps getting rate limited"""
+        with self._lock:
+            if key not in self._used:
+                return
+            now = time.monotonic()
+            until, cooldown = self._throttled.get(key, (0, 0))
+            if until > now:
+                return  # Concurrent failures of the same burst
+            # Back off further only if the previous cooldown ended recently
+            recent = cooldown and now - until < RATE_LIMIT_MAX_COOLDOWN
+            cooldown = min(cooldown * 2, RATE_LIMIT_MAX_COOLDOWN) if recent else RATE_LIMIT_COOLDOWN
+            self._throttled[key] = (now + cooldown, cooldown)
+            logger.warning(f"API {self.key_label(key)} is rate limited; cooling down for {cooldown:g}s")
+
+    def key_label(self, key):
+        return f"key {self.api_keys.index(key) + 1}" if key in self.api_keys else "unknown key"
+
+    def flush(self):
+        """Merge local spending into the state file and pick up other processes' spending"""
+        if not self.path:
+            return
+        with self._lock:
+            self._roll_day()
+            try:
+                with open(self.path, 'a+', encoding='utf-8') as f:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    f.seek(0)
+                    content = f.read()
+                    try:
+                        state = json.loads(content) if content.strip() else {}
+                    except ValueError:
+                        logger.warning(f"Ignoring unreadable quota state in {self.path}")
+                        state = {}
+
+                    for key, key_id in self._ids.items():
+                        entry = state.get(key_id)
+                        if not entry or entry.get('day') != self._day:
+                            entry = {'day': self._day, 'used': 0, 'exhausted': False}
+                        entry['used'] += self._pending[key]
+                        entry['exhausted'] = entry['exhausted'] or key in self._exhausted
+                        state[key_id] = entry
+
+                        self._pending[key] = 0
+                        self._used[key] = entry['used']
+                        if entry['exhausted']:
+                            self._exhausted.add(key)
+
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f, indent=2)
+            except OSError as e:
+                logger.warning(f"Could not persist quota state to {self.path}: {e}")
+            self._last_flush = time.monotonic()
+
+    def stats(self):
+        """Get spent and remaining budget per key for the current quota day"""
+        with self._lock:
+            self._roll_day()
+            return {
+                'quota_day': self._day,
+                'resets_at': next_reset().isoformat(),
+                'daily_quota': self.daily_quota,
+                'keys': {
+                    self.key_label(key): {
+                        'used': self._used[key],
+                        'remaining': 0 if key in self._exhausted else max(self.daily_quota - self._used[key], 0),
+                        'exhausted': key in self._exhausted,
+                        'throttled_for': round(max(self._throttled.get(key, (0, 0))[0] - time.monotonic(), 0), 1)
+                    }
+                    for key in self.api_keys
+                }
+            }
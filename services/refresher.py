@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotRefresher:
+    """Rebuilds a snapshot on a schedule and serves it stale-while-revalidate.
+
+    `build` is called in a background thread every `interval` seconds.
+    Readers always get the latest completed snapshot immediately; if it is
+    older than `stale_after` a revalidation is started without waiting for
+    it. Until the first non-empty build completes there is no snapshot, and
+    reads wait for it at most their timeout.
+    """
+
+    def __init__(self, build, interval=300, stale_after=None, name='snapshot-refresher'):
+        self.build = build
+        self.interval = interval
+        self.stale_after = stale_after or interval
+        self.name = name
+        self._snapshot = None
+        self._built_at = None
+        self._build_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
+        self.last_duration = None
+
+    def start(self):
+        """Start the scheduler thread once"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self):
+        """Rebuild the snapshot unless a rebuild is already running"""
+        if not self._build_lock.acquire(blocking=False):
+            return False
+        try:
+            start = time.monotonic()
+            snapshot = self.build()
+            self.last_duration = time.monotonic() - start
+            # An empty build (e.g. out of quota) never replaces or becomes the snapshot
+            if snapshot is not None and snapshot.get('videos'):
+                self._snapshot = snapshot
+                self._built_at = time.monotonic()
+            self.refreshes += 1
+            return True
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Background refresh failed: {e}")
+            return False
+        finally:
+            self._build_lock.release()
+            self._ready.set()
+
+    def revalidate(self):
+        """Start a refresh in the background without waiting for it"""
+        if not self._build_lock.locked():
+            threading.Thread(target=self.refresh, name=f"{self.name}-revalidate", daemon=True).start()
+
+    def get(self, timeout=None):
+        """Get (snapshot, age in seconds), revalidating in the background when stale.
+        
+        Returns (None, None) if there is no snapshot after waiting `timeout` seconds
+        (forever if None) for the first build.
+        """
+        self.start()
+        if not self._ready.wait(timeout):
+            return None, None
+        if self._snapshot is None:
+            return None, None
+
+        age = time.monotonic() - self._built_at
+        if age > self.stale_after:
+            self.revalidate()
+        return self._snapshot, age
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'stale_after': self.stale_after,
+            'age': round(time.monotonic() - self._built_at, 1) if self._built_at is not None else None,
+            'refreshing': self._build_lock.locked(),
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'last_duration': round(self.last_duration, 3) if self.last_duration is not None else None
+        }
@@ -0,0 +1,87 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from services.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # Optional; responses are then only gzip-compressed
+    brotli = None
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "64"))
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def make_etag(*parts):
+    """Get a strong ETag value (without quotes) for the parts identifying a response"""
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressedResponseCache:
+    """LRU cache of serialized response bodies and their compressed forms, keyed by ETag.
+
+    A body is serialized once per ETag and each encoding is compressed at most
+    once, the first time a client accepts it.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # etag -> {encoding or 'identity': body}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compressions = 0
+
+    def get_body(self, etag, build, encoding='identity'):
+        """Get (body, encoding) for etag, building the body with build() on a miss.
+
+        Bodies under COMPRESS_MIN_SIZE are returned uncompressed with encoding 'identity'.
+        """
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is not None:
+                self._entries.move_to_end(etag)
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache('response', entry is not None)
+
+        if entry is None:
+            entry = {'identity': build()}
+        if len(entry['identity']) < COMPRESS_MIN_SIZE:
+            encoding = 'identity'
+        if encoding not in entry:
+            entry[encoding] = compress(entry['identity'], encoding)
+            self.compressions += 1
+
+        with self._lock:
+            self._entries[etag] = entry
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry[encoding], encoding
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+                'compressions': self.compressions,
+                'encodings': list(ENCODINGS)
+            }
@@ -0,0 +1,250 @@
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+GRANULARITIES = ('hour', 'day', 'week')
+CHANNEL = '*'
+
+# Number of most recently added comments kept to answer delta queries
+DELTA_LOG_SIZE = int(os.getenv("DELTA_LOG_SIZE", "20000"))
+# Characters of comment text kept in the delta log
+DELTA_TEXT_LENGTH = 200
+# Number of most recently ingested videos whose comment ids are remembered for deduplication
+SEEN_VIDEOS = int(os.getenv("ROLLUP_SEEN_VIDEOS", "2000"))
+# Number of cursors whose sent buckets are kept to diff deltas against
+SENT_BUCKETS_SIZE = int(os.getenv("SENT_BUCKETS_SIZE", "256"))
+
+
+def bucket_key(date, granularity):
+    """Get the bucket label of an ISO 8601 timestamp for a granularity"""
+    if granularity == 'hour':
+        return date[:13] + ':00'
+    if granularity == 'day':
+        return date[:10]
+    day = datetime.strptime(date[:10], '%Y-%m-%d')
+    return (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+
+
+def _format_buckets(merged, last=None):
+    buckets = sorted(merged.items())
+    if last:
+        buckets = buckets[-last:]
+    return [
+        (bucket, {
+            sentiment: {'count': count, 'likes': likes, 'polarity_sum': round(polarity_sum, 4)}
+            for sentiment, (count, likes, polarity_sum) in entry.items()
+        })
+        for bucket, entry in buckets
+    ]
+
+
+def aggregate(comments, granularity='day', last=None):
+    """Get the buckets of exactly the given comments, in the format of SentimentRollup.query"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    merged = {}
+    for comment in comments:
+        entry = merged.setdefault(bucket_key(comment['date'], granularity), {s: [0, 0, 0.0] for s in SENTIMENTS})
+        totals = entry[comment['sentiment']]
+        totals[0] += 1
+        totals[1] += comment.get('likeCount', 0)
+        totals[2] += comment.get('polarity') or 0.0
+    return _format_buckets(merged, last)
+
+
+class SentimentRollup:
+    """Incrementally maintained hourly/daily/weekly sentiment aggregates.
+
+    Every bucket holds, per sentiment, the comment count, the like total and
+    the polarity sum, both per video and channel-wide. Comments are added
+    once (deduplicated by comment id) as they are ingested, so queries cost
+    O(buckets) instead of a scan over every comment.
+
+    Comment ids are remembered per video for the SEEN_VIDEOS most recently
+    ingested videos only; a video that drops out and is ingested again later
+    is counted again.
+
+    Every added comment gets a sequence number, and the latest ones are kept in
+    a bounded log so changes since a cursor can be served without a full reload.
+    The log holds only the fields sent to clients, with the text truncated.
+    """
+
+    def __init__(self, log_size=DELTA_LOG_SIZE, seen_videos=SEEN_VIDEOS):
+        # granularity -> scope (video id or CHANNEL) -> bucket -> {sentiment: [count, likes, polarity_sum]}
+        self._buckets = {granularity: {} for granularity in GRANULARITIES}
+        self._seen = OrderedDict()  # video id -> ids of its added comments, least recently ingested first
+        self._seen_videos = seen_videos
+        self._lock = threading.Lock()
+        # Number of comments added so far; doubles as the version of the aggregates
+        self.version = 0
+        # Cursors are only meaningful within the process (and rollup) that issued them
+        self.epoch = secrets.token_hex(4)
+        self._log = deque(maxlen=log_size)  # (sequence, added_ts, video_id, comment)
+
+    def ingest(self, video_id, comments):
+        """Add comments not seen before, returning how many were added"""
+        added = 0
+        with self._lock:
+            seen = self._seen.pop(video_id, None) or set()
+            self._seen[video_id] = seen
+            while len(self._seen) > self._seen_videos:
+                self._seen.popitem(last=False)
+            for comment in comments:
+                comment_id = comment.get('id') or (comment['author'], comment['date'])
+                if comment_id in seen:
+                    continue
+                seen.add(comment_id)
+                added += 1
+                self.version += 1
+                self._log.append((self.version, time.time(), video_id, {
+                    'id': comment.get('id'),
+                    'author': comment['author'],
+                    'comment': comment['comment'][:DELTA_TEXT_LENGTH],
+                    'likeCount': comment.get('likeCount', 0),
+                    'sentiment': comment['sentiment'],
+                    'date': comment['date']
+                }))
+                for granularity, scopes in self._buckets.items():
+                    bucket = bucket_key(comment['date'], granularity)
+                    for scope in (video_id, CHANNEL):
+                        entry = scopes.setdefault(scope, {}).setdefault(bucket, {s: [0, 0, 0.0] for s in SENTIMENTS})
+                        totals = entry[comment['sentiment']]
+                        totals[0] += 1
+                        totals[1] += comment.get('likeCount', 0)
+                        totals[2] += comment.get('polarity', 0.0)
+        return added
+
+    def query(self, granularity='day', video_ids=None, last=None):
+        """Get the latest `last` non-empty buckets, oldest first, as (bucket, totals) pairs.
+
+        Totals map each sentiment to {'count', 'likes', 'polarity_sum'}. With
+        `video_ids` the buckets of those videos are merged; otherwise the
+        channel-wide buckets are used.
+        """
+        if granularity not in self._buckets:
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        with self._lock:
+            scopes = self._buckets[granularity]
+            if video_ids is None:
+                merged = {bucket: {s: list(v) for s, v in entry.items()} for bucket, entry in scopes.get(CHANNEL, {}).items()}
+            else:
+                merged = {}
+                for video_id in video_ids:
+                    for bucket, entry in scopes.get(video_id, {}).items():
+                        target = merged.setdefault(bucket, {s: [0, 0, 0.0] for s in SENTIMENTS})
+                        for sentiment, (count, likes, polarity_sum) in entry.items():
+                            target[sentiment][0] += count
+                            target[sentiment][1] += likes
+                            target[sentiment][2] += polarity_sum
+
+        return _format_buckets(merged, last)
+
+    def cursor(self):
+        """Get a cursor for the current state, to pass to changes_since later"""
+        with self._lock:
+            return f"{self.epoch}.{self.version}"
+
+    def changes_since(self, since, granularity='day', video_ids=None):
+        """Get the comments added after a cursor and the buckets they changed.
+
+        `since` is a cursor from cursor() or an ISO 8601 timestamp of when the
+        caller last synced. Returns {'cursor', 'comments', 'buckets'} where comments
+        are (video_id, comment) pairs and buckets are the current totals of every
+        bucket they touched, in the format of query(). Returns None when the
+        changes can no longer be told apart (unknown cursor or log overflow) and
+        the caller has to reload everything.
+        """
+        if granularity not in self._buckets:
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        with self._lock:
+            cursor = f"{self.epoch}.{self.version}"
+            oldest = self._log[0] if self._log else None
+            if re.fullmatch(r'[0-9a-f]+\.\d+', since):
+                epoch, _, sequence = since.partition('.')
+                if epoch != self.epoch or int(sequence) > self.version:
+                    return None
+                sequence = int(sequence)
+                if oldest is not None and oldest[0] > sequence + 1:
+                    return None
+                entries = [entry for entry in self._log if entry[0] > sequence]
+            else:
+                try:
+                    since_ts = datetime.fromisoformat(since.replace('Z', '+00:00'))
+                except ValueError:
+                    return None
+                if since_ts.tzinfo is None:
+                    since_ts = since_ts.replace(tzinfo=timezone.utc)
+                since_ts = since_ts.timestamp()
+                # Comments dropped from the log may have been added after the timestamp
+                if len(self._log) == self._log.maxlen and oldest[1] > since_ts:
+                    return None
+                entries = [entry for entry in self._log if entry[1] > since_ts]
+
+        if video_ids is not None:
+            wanted = set(video_ids)
+            entries = [entry for entry in entries if entry[2] in wanted]
+        touched = {bucket_key(entry[3]['date'], granularity) for entry in entries}
+        buckets = [(bucket, totals) for bucket, totals in self.query(granularity, video_ids) if bucket in touched]
+        return {
+            'cursor': cursor,
+            'comments': [(video_id, comment) for _, _, video_id, comment in entries],
+            'buckets': buckets
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'comments': self.version,
+                'seen_videos': len(self._seen),
+                'version': self.version,
+                'delta_log': len(self._log),
+                'videos': len(self._buckets['day']) - (1 if CHANNEL in self._buckets['day'] else 0),
+                'buckets': {granularity: len(scopes.get(CHANNEL, {})) for granularity, scopes in self._buckets.items()}
+            }
+
+
+class SentBuckets:
+    """Bucket windows sent to clients, keyed by the cursor they were sent with.
+
+    Used where buckets can also lose comments, so a delta cannot be derived from
+    the added comments alone: the next request with that cursor is answered with
+    the buckets that differ from what was sent. A key that was sent with two
+    different windows is ambiguous and can no longer be diffed.
+    """
+
+    def __init__(self, size=SENT_BUCKETS_SIZE):
+        self.size = size
+        self._entries = OrderedDict()  # key -> buckets, or None when ambiguous
+        self._lock = threading.Lock()
+
+    def remember(self, key, buckets):
+        with self._lock:
+            previous = self._entries.get(key, buckets)
+            self._entries[key] = buckets if previous == buckets else None
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def changed(self, key, buckets):
+        """Get the buckets that differ from those sent with key, oldest first, or None if that is unknown.
+
+        Buckets that were sent but are no longer in `buckets` are returned with zero
+        totals, for the client to drop.
+        """
+        with self._lock:
+            sent = self._entries.get(key)
+        if sent is None:
+            return None
+        sent = dict(sent)
+        current = dict(buckets)
+        empty = {sentiment: {'count': 0, 'likes': 0, 'polarity_sum': 0.0} for sentiment in SENTIMENTS}
+        changed = [(bucket, empty) for bucket in sent if bucket not in current]
+        changed += [(bucket, totals) for bucket, totals in buckets if sent.get(bucket) != totals]
+        return sorted(changed, key=lambda item: item[0])
@@ -0,0 +1,115 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Memo size (entries) and optional JSON file used to warm-start it
+SENTIMENT_MEMO_SIZE = int(os.getenv("SENTIMENT_MEMO_SIZE", "50000"))
+SENTIMENT_MEMO_PATH = os.getenv("SENTIMENT_MEMO_PATH", "")
+
+
+class SentimentMemo:
+    """Bounded LRU memo of cleaned comment text -> (polarity, subjectivity, label).
+
+    Keys are hashes of the whitespace-collapsed text, which TextBlob scores
+    identically, so repeated comments such as "first!" are only scored once
+    per process. Case is kept: emoticons such as ":D" and ":d" score differently.
+    """
+
+    def __init__(self, max_entries=SENTIMENT_MEMO_SIZE, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load(path)
+
+    @staticmethod
+    def key(text):
+        normalized = ' '.join(text.split())
+        # Versioned so memo files saved with the old lower-cased keys are not reused
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16, person=b'memo-v2').hexdigest()
+
+    def get(self, text):
+        """Get the memoized (polarity, subjectivity, label) for text, or None"""
+        key = self.key(text)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, text, result):
+        """Memoize a (polarity, subjectivity, label) result for text"""
+        key = self.key(text)
+        with self._lock:
+            self._entries[key] = tuple(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, text, compute):
+        """Get the memoized result for text, computing and storing it on a miss"""
+        result = self.get(text)
+        if result is None:
+            result = tuple(compute(text))
+            self.put(text, result)
+        return result
+
+    def load(self, path):
+        """Warm-start the memo from a JSON file written by save()"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load sentiment memo from {path}: {e}")
+            return
+        with self._lock:
+            for key, result in list(entries.items())[-self.max_entries:]:
+                self._entries[key] = tuple(result)
+        logger.info(f"Loaded {len(entries)} memoized sentiments from {path}")
+
+    def save(self, path=None):
+        """Write the memo to a JSON file, most recently used entries last"""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            entries = dict(self._entries)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not save sentiment memo to {path}: {e}")
+
+    def stats(self):
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0
+            }
+
+
+# Shared by every sentiment implementation in the process
+sentiment_memo = SentimentMemo(path=SENTIMENT_MEMO_PATH or None)
+if SENTIMENT_MEMO_PATH:
+    atexit.register(sentiment_memo.save)
@@ -0,0 +1,139 @@
+import threading
+from array import array
+
+from textblob._text import EMOTICONS, PUNCTUATION
+from textblob.en import sentiment as pattern_sentiment
+
+# Maximum absolute difference from TextBlob(text).sentiment for polarity and
+# subjectivity. The engine applies pattern's rules in the same order, so in
+# practice results are identical; the tolerance only absorbs float rounding.
+PARITY_TOLERANCE = 1e-9
+
+
+class LexiconSentimentEngine:
+    """Batch sentiment scorer compatible with TextBlob's PatternAnalyzer.
+
+    The pattern sentiment lexicon is loaded once into a word -> index map
+    and parallel arrays of polarity, subjectivity, intensity and modifier
+    flags. A batch is tokenized up front and all tokens are resolved to
+    lexicon indices in a single pass, then pattern's negation, modifier,
+    exclamation and emoticon rules are applied per text.
+    """
+
+    def __init__(self, lexicon=pattern_sentiment):
+        self.tokenizer = lexicon.tokenizer
+        self.negations = frozenset(lexicon.negations)
+        self.modifier = lexicon.modifier
+        self.index = {}
+        self.polarity = array('d')
+        self.subjectivity = array('d')
+        self.intensity = array('d')
+        self.is_modifier = array('b')
+        for word, senses in lexicon.items():
+            polarity, subjectivity, intensity = senses[None]
+            self.index[word] = len(self.polarity)
+            self.polarity.append(polarity)
+            self.subjectivity.append(subjectivity)
+            self.intensity.append(intensity)
+            self.is_modifier.append(any(pos in senses for pos in lexicon.modifiers))
+        self.emoticons = {}
+        for (_, polarity), faces in EMOTICONS.items():
+            for face in faces:
+                self.emoticons.setdefault(face.lower(), polarity)
+
+    def tokenize(self, text):
+        return ' '.join(self.tokenizer(text)).lower().split()
+
+    def score_batch(self, texts):
+        """Get a (polarity, subjectivity) tuple for every text"""
+        tokens = []
+        offsets = [0]
+        for text in texts:
+            tokens.extend(self.tokenize(text))
+            offsets.append(len(tokens))
+        indices = list(map(self.index.get, tokens))
+
+        return [
+            self._score(tokens, indices, offsets[k], offsets[k + 1])
+            for k in range(len(texts))
+        ]
+
+    def score(self, text):
+        """Get a (polarity, subjectivity) tuple for a single text"""
+        return self.score_batch([text])[0]
+
+    def _score(self, tokens, indices, start, end):
+        # Mirrors pattern's Sentiment.assessments() for untagged words.
+        # Each assessment is [polarity, subjectivity, intensity, negated].
+        assessments = []
+        modifier = None
+        negation = None
+        for k in range(start, end):
+            word = tokens[k]
+            idx = indices[k]
+            if idx is not None:
+                if modifier is None:
+                    assessments.append([self.polarity[idx], self.subjectivity[idx], self.intensity[idx], False])
+                else:
+                    last = assessments[-1]
+                    last[0] = max(-1.0, min(self.polarity[idx] * last[2], +1.0))
+                    last[1] = max(-1.0, min(self.subjectivity[idx] * last[2], +1.0))
+                    last[2] = self.intensity[idx]
+                if negation is not None:
+                    assessments[-1][2] = 1.0 / assessments[-1][2]
+                    assessments[-1][3] = True
+                modifier = word if self.is_modifier[idx] else None
+                negation = word if word in self.negations else None
+            else:
+                if word in self.negations:
+                    negation = word
+                elif negation and len(word.strip("'")) > 1:
+                    negation = None
+                if negation is not None and modifier is not None and self.modifier(modifier):
+                    assessments[-1][3] = True
+                    negation = None
+                elif modifier and len(word) > 2:
+                    modifier = None
+                if word == '!' and assessments:
+                    assessments[-1][0] = max(-1.0, min(assessments[-1][0] * 1.25, +1.0))
+                if word == '(!)':
+                    assessments.append([0.0, 1.0, 1.0, False])
+                if not word.isalpha() and len(word) <= 5 and word not in PUNCTUATION:
+                    polarity = self.emoticons.get(word)
+                    if polarity is not None:
+                        assessments.append([polarity, 1.0, 1.0, False])
+
+        if not assessments:
+            return 0.0, 0.0
+        polarity = 0
+        subjectivity = 0
+        for p, s, _, negated in assessments:
+            # "not good" = slightly bad, "not bad" = slightly good
+            polarity += p * -0.5 if negated else p
+            subjectivity += s
+        return polarity / float(len(assessments)), subjectivity / float(len(assessments))
+
+
+def max_parity_error(texts, engine=None):
+    """Get the largest polarity/subjectivity deviation from TextBlob over texts"""
+    from textblob import TextBlob
+
+    engine = engine or get_sentiment_engine()
+    error = 0.0
+    for text, (polarity, subjectivity) in zip(texts, engine.score_batch(texts)):
+        expected = TextBlob(text).sentiment
+        error = max(error, abs(polarity - expected.polarity), abs(subjectivity - expected.subjectivity))
+    return error
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_sentiment_engine():
+    """Get the process-wide engine, loading the lexicon on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = LexiconSentimentEngine()
+        return _engine
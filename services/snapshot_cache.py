@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+
+from services.metrics import record_cache
+
+
+class SnapshotCache:
+    """In-process TTL cache of fetched-and-scored channel snapshots.
+
+    A snapshot holds the latest videos (newest first) and the scored comments
+    of each video (newest first), so any request for a smaller
+    ``(max_videos, max_comments)`` can be answered by slicing a larger one.
+    Per-video comment lists are cached separately so the video details
+    endpoint can share them.
+    """
+
+    def __init__(self, ttl=300, max_entries=8, max_video_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_video_entries = max_video_entries
+        self._snapshots = OrderedDict()  # (max_videos, max_comments) -> (stored_at, snapshot)
+        self._video_comments = OrderedDict()  # video_id -> (stored_at, limit, comments)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.video_hits = 0
+        self.video_misses = 0
+        self.evictions = 0
+
+    def _is_fresh(self, stored_at):
+        return time.monotonic() - stored_at < self.ttl
+
+    def get_snapshot(self, max_videos, max_comments):
+        """Get a cached snapshot covering the requested sizes, or None"""
+        with self._lock:
+            best_key = None
+            for key, (stored_at, _) in list(self._snapshots.items()):
+                if not self._is_fresh(stored_at):
+                    del self._snapshots[key]
+                    continue
+                if key[0] >= max_videos and key[1] >= max_comments:
+                    if best_key is None or key < best_key:
+                        best_key = key
+
+            if best_key is None:
+                self.misses += 1
+                record_cache('snapshot', False)
+                return None
+
+            self._snapshots.move_to_end(best_key)
+            self.hits += 1
+            record_cache('snapshot', True)
+            return self._snapshots[best_key][1]
+
+    def put_snapshot(self, max_videos, max_comments, snapshot):
+        """Store a snapshot fetched for the given sizes"""
+        with self._lock:
+            key = (max_videos, max_comments)
+            # A new snapshot supersedes any cached one it covers
+            for cached_key in list(self._snapshots):
+                if cached_key[0] <= max_videos and cached_key[1] <= max_comments:
+                    del self._snapshots[cached_key]
+            self._snapshots[key] = (time.monotonic(), snapshot)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+                self.evictions += 1
+
+            for video in snapshot['videos']:
+                comments = snapshot['comments'].get(video['videoId'])
+                if comments:
+                    self._put_video_comments(video['videoId'], max_comments, comments)
+
+    def get_video_comments(self, video_id, max_comments):
+        """Get cached comments for a video, or None if not covered"""
+        with self._lock:
+            entry = self._video_comments.get(video_id)
+            if entry is not None and not self._is_fresh(entry[0]):
+                del self._video_comments[video_id]
+                entry = None
+
+            # A list shorter than its fetch limit holds every comment there is
+            if entry is None or (entry[1] < max_comments and len(entry[2]) >= entry[1]):
+                self.video_misses += 1
+                record_cache('video_comments', False)
+                return None
+
+            self._video_comments.move_to_end(video_id)
+            self.video_hits += 1
+            record_cache('video_comments', True)
+            return entry[2][:max_comments]
+
+    def put_video_comments(self, video_id, max_comments, comments):
+        """Store comments fetched for a video with the given limit"""
+        with self._lock:
+            self._put_video_comments(video_id, max_comments, comments)
+
+    def _put_video_comments(self, video_id, max_comments, comments):
+        entry = self._video_comments.get(video_id)
+        if entry is not None and self._is_fresh(entry[0]) and entry[1] > max_comments:
+            return
+        self._video_comments[video_id] = (time.monotonic(), max_comments, comments)
+        self._video_comments.move_to_end(video_id)
+        while len(self._video_comments) > self.max_video_entries:
+            self._video_comments.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every cached snapshot and comment list"""
+        with self._lock:
+            self._snapshots.clear()
+            self._video_comments.clear()
+
+    def stats(self):
+        """Get hit/miss counters and current sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            video_lookups = self.video_hits + self.video_misses
+            return {
+                'ttl': self.ttl,
+                'snapshots': len(self._snapshots),
+                'video_comment_lists': len(self._video_comments),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+                'video_hits': self.video_hits,
+                'video_misses': self.video_misses,
+                'video_hit_ratio': round(self.video_hits / video_lookups, 4) if video_lookups else 0,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from services.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Directory of cached upstream responses; empty disables the cache
+UPSTREAM_CACHE_DIR = os.getenv("UPSTREAM_CACHE_DIR", "")
+# revalidate: send If-None-Match for responses that came with an ETag and reuse the body on 304
+# record: like revalidate, but also keep responses without an ETag so they can be replayed
+# replay: answer from the cache without calling the API, fetching and recording only misses
+# offline: answer only from the cache; misses fail as connection errors
+UPSTREAM_CACHE_MODE = os.getenv("UPSTREAM_CACHE_MODE", "revalidate")
+UPSTREAM_CACHE_MODES = ('revalidate', 'record', 'replay', 'offline')
+# Parameters that do not change the response and are left out of the cache key
+IGNORED_PARAMS = ('key',)
+# In revalidate mode, entries older than this many seconds are dropped and the most
+# recently stored UPSTREAM_CACHE_MAX_ENTRIES are kept; recordings are never pruned
+UPSTREAM_CACHE_MAX_AGE = int(os.getenv("UPSTREAM_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+UPSTREAM_CACHE_MAX_ENTRIES = int(os.getenv("UPSTREAM_CACHE_MAX_ENTRIES", "20000"))
+# Number of stores between two prunes of the directory
+PRUNE_EVERY = 200
+
+
+class UpstreamResponseCache:
+    """Disk-backed cache of YouTube Data API responses.
+
+    Entries are keyed by endpoint and the sorted request parameters, without
+    the API key, and stored one JSON file each so worker processes can share
+    the directory; files are written to a temporary name and renamed into
+    place. Only 200 responses are stored.
+
+    In revalidate mode the cache only saves bandwidth, so it is bounded: entries
+    older than `max_age` are not used, and every PRUNE_EVERY stores the directory
+    is pruned down to the newest `max_entries` entries within that age. The other
+    modes keep everything, as recordings are meant to be replayed.
+    """
+
+    def __init__(self, path, mode=UPSTREAM_CACHE_MODE, max_age=UPSTREAM_CACHE_MAX_AGE,
+                 max_entries=UPSTREAM_CACHE_MAX_ENTRIES):
+        if mode not in UPSTREAM_CACHE_MODES:
+            raise ValueError(f"UPSTREAM_CACHE_MODE must be one of {', '.join(UPSTREAM_CACHE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.max_age = max_age
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.revalidated = 0
+        self.replayed = 0
+        self.misses = 0
+        self.stores = 0
+        self.pruned = 0
+        if self.mode == 'revalidate':
+            self.prune()
+
+    @staticmethod
+    def key(url, params):
+        endpoint = urlparse(url).path.rsplit('/', 1)[-1]
+        normalized = sorted((str(name), str(value)) for name, value in (params or {}).items() if name not in IGNORED_PARAMS)
+        return hashlib.sha1(json.dumps([endpoint, normalized]).encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def load(self, key):
+        """Get the stored entry for key, or None"""
+        try:
+            with open(self._file(key), encoding='utf-8') as f:
+                entry = json.load(f)
+            if self.mode == 'revalidate' and time.time() - entry.get('stored_at', 0) > self.max_age:
+                return None
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading cached upstream response {key}: {e}")
+            return None
+
+    def store(self, key, url, params, response):
+        """Store a 200 response, if the mode keeps it"""
+        etag = response.headers.get('ETag')
+        if response.status_code != 200 or (etag is None and self.mode == 'revalidate'):
+            return
+        entry = {
+            'url': url,
+            'params': {name: value for name, value in (params or {}).items() if name not in IGNORED_PARAMS},
+            'etag': etag,
+            'content_type': response.headers.get('Content-Type', 'application/json'),
+            'body': response.content.decode('utf-8'),
+            'stored_at': time.time()
+        }
+        file = self._file(key)
+        try:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, file)
+            with self._lock:
+                self.stores += 1
+                prune = self.mode == 'revalidate' and self.stores % PRUNE_EVERY == 0
+        except Exception as e:
+            logger.error(f"Error storing upstream response {key}: {e}")
+            return
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Delete entries older than max_age and all but the newest max_entries, returning how many were deleted"""
+        now = time.time()
+        entries = []
+        for directory, _, names in os.walk(self.path):
+            for name in names:
+                file = os.path.join(directory, name)
+                try:
+                    entries.append((os.path.getmtime(file), file))
+                except OSError:
+                    continue  # Replaced or pruned by another worker meanwhile
+        entries.sort(reverse=True)
+
+        removed = 0
+        kept = 0
+        for mtime, file in entries:
+            if file.endswith('.json'):
+                expired = now - mtime > self.max_age or kept >= self.max_entries
+                kept += not expired
+            else:
+                # Temporary files of a store in progress are young; older ones were left by a crash
+                expired = now - mtime > 3600
+            if expired:
+                try:
+                    os.remove(file)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            with self._lock:
+                self.pruned += removed
+            logger.info(f"Pruned {removed} cached upstream responses from {self.path}")
+        return removed
+
+    @staticmethod
+    def to_response(entry, url):
+        """Build a 200 response from a stored entry"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.encoding = 'utf-8'
+        response._content = entry['body'].encode('utf-8')
+        response.headers = CaseInsensitiveDict({'Content-Type': entry['content_type']})
+        if entry.get('etag'):
+            response.headers['ETag'] = entry['etag']
+        response.from_cache = True
+        return response
+
+    def get(self, send, url, params):
+        """Get the response for a GET, calling send(headers) only when the cache cannot answer"""
+        key = self.key(url, params)
+        entry = self.load(key)
+
+        if entry is not None and self.mode in ('replay', 'offline'):
+            with self._lock:
+                self.replayed += 1
+            record_cache('upstream', True)
+            return self.to_response(entry, url)
+        if self.mode == 'offline':
+            with self._lock:
+                self.misses += 1
+            record_cache('upstream', False)
+            raise requests.exceptions.ConnectionError(f"No cached upstream response for {url} in offline mode")
+
+        headers = {'If-None-Match': entry['etag']} if entry is not None and entry.get('etag') else {}
+        response = send(headers)
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            record_cache('upstream', True)
+            cached = self.to_response(entry, url)
+            cached.from_cache = False  # The API was still called (and charged)
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        record_cache('upstream', False)
+        self.store(key, url, params, response)
+        return response
+
+    def stats(self):
+        with self._lock:
+            lookups = self.revalidated + self.replayed + self.misses
+            return {
+                'mode': self.mode,
+                'path': self.path,
+                'revalidated': self.revalidated,
+                'replayed': self.replayed,
+                'misses': self.misses,
+                'stores': self.stores,
+                'pruned': self.pruned,
+                'hit_ratio': round((self.revalidated + self.replayed) / lookups, 4) if lookups else 0
+            }
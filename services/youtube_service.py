@@ -1,67 +1,159 @@
-import requests
 import json
+import time
 from datetime import datetime
+from services.http_client import YOUTUBE_API_BASE_URL, get_upstream_client
+from services.metrics import KEY_ROTATIONS, QUOTA_ERRORS, UPSTREAM_CALLS
+from services.quota import QUOTA_COSTS, QuotaScheduler, quota_error_kind
 
 class YouTubeService:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.base_url = "https://www.googleapis.com/youtube/v3"
+    def __init__(self, api_key=None, quota=None, throttle=None):
+        """Every request picks its key through `quota` (a QuotaScheduler, by default one
+        for `api_key` alone) and, if given, calls throttle(key) before it is sent."""
+        self.quota = quota or QuotaScheduler([api_key])
+        self.throttle = throttle
+        self.base_url = YOUTUBE_API_BASE_URL
+        self.http = get_upstream_client()
+        self._uploads_playlists = {}
     
-    def get_latest_videos(self, channel_id, max_results=50):
-        """Get latest videos from a channel"""
-        url = f"{self.base_url}/search"
+    def _get_json(self, url, params):
+        """GET an API endpoint with the key that has the most quota left, rotating keys on quota errors"""
+        endpoint = url.rsplit('/', 1)[-1]
+        cost = QUOTA_COSTS.get(endpoint, 1)
+        failed_key = None
+        for _ in range(max(len(self.quota.api_keys), 1)):
+            key = self.quota.pick_key(cost)
+            if key is None:
+                break
+            if failed_key is not None and key != failed_key:
+                KEY_ROTATIONS.inc()
+            if self.throttle is not None:
+                self.throttle(key)
+            
+            response = self.http.get(url, params={**params, 'key': key}, key_label=self.quota.key_label(key))
+            UPSTREAM_CALLS.labels(endpoint, self.quota.key_label(key), 'cached' if response.from_cache else str(response.status_code)).inc()
+            if not response.from_cache:
+                self.quota.charge(key, cost)
+            
+            if response.status_code == 403:
+                try:
+                    error = response.json().get('error', {})
+                except ValueError:
+                    error = {}
+                kind = quota_error_kind(error)
+                if kind is not None:
+                    QUOTA_ERRORS.labels(self.quota.key_label(key), kind).inc()
+                    if kind == 'rate_limit':
+                        self.quota.mark_throttled(key)
+                    else:
+                        self.quota.mark_exhausted(key)
+                    failed_key = key
+                    continue
+            response.raise_for_status()
+            return response.json()
+        raise RuntimeError(f"No API key has {cost} quota units left and is not rate limited to call {endpoint}")
+    
+    def get_uploads_playlist_id(self, channel_id):
+        """Get a channel's uploads playlist id, resolved once per channel"""
+        if channel_id not in self._uploads_playlists:
+            url = f"{self.base_url}/channels"
+            params = {
+                'id': channel_id,
+                'part': 'contentDetails'
+            }
+            
+            items = self._get_json(url, params).get('items', [])
+            if not items:
+                raise ValueError(f"Channel not found: {channel_id}")
+            self._uploads_playlists[channel_id] = items[0]['contentDetails']['relatedPlaylists']['uploads']
+        return self._uploads_playlists[channel_id]
+    
+    def get_latest_videos(self, channel_id, max_results=50, published_after=None):
+        """Get latest videos from a channel via its uploads playlist.
+        
+        Stops paging at the first video published before `published_after`
+        (an ISO 8601 timestamp), if given.
+        """
+        url = f"{self.base_url}/playlistItems"
         params = {
-            'key': self.api_key,
-            'channelId': channel_id,
-            'part': 'snippet,id',
-            'order': 'date',
-            'maxResults': max_results,
-            'type': 'video'
+            'playlistId': self.get_uploads_playlist_id(channel_id),
+            'part': 'snippet,contentDetails',
+            'maxResults': min(max_results, 50)
         }
         
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
         videos = []
-        for item in data.get('items', []):
-            if item['id'].get('videoId'):
+        while len(videos) < max_results:
+            data = self._get_json(url, params)
+            
+            reached_cutoff = False
+            for item in data.get('items', []):
+                published_at = item.get('contentDetails', {}).get('videoPublishedAt')
+                if not published_at:
+                    continue
+                if published_after and published_at < published_after:
+                    reached_cutoff = True
+                    break
                 video = {
-                    'videoId': item['id']['videoId'],
+                    'videoId': item['contentDetails']['videoId'],
                     'title': item['snippet']['title'],
                     'description': item['snippet']['description'],
-                    'publishedAt': item['snippet']['publishedAt'],
-                    'thumbnail': item['snippet']['thumbnails']['medium']['url']
+                    'publishedAt': published_at,
+                    'thumbnail': item['snippet']['thumbnails'].get('medium', {}).get('url', '')
                 }
                 videos.append(video)
+            
+            if reached_cutoff or not data.get('nextPageToken'):
+                break
+            params['pageToken'] = data['nextPageToken']
         
-        return videos
+        videos.sort(key=lambda video: video['publishedAt'], reverse=True)
+        return videos[:max_results]
     
     def get_video_comments(self, video_id, max_results=50):
         """Get comments for a specific video"""
+        return list(self.iter_video_comments(video_id, limit=max_results))
+    
+    def iter_video_comments(self, video_id, limit=None, published_after=None, time_budget=None):
+        """Yield comments for a video, newest first, one page at a time.
+        
+        Follows nextPageToken lazily and stops after `limit` comments, at the first
+        comment published at or before `published_after`, or once `time_budget`
+        seconds have elapsed.
+        """
         url = f"{self.base_url}/commentThreads"
         params = {
-            'key': self.api_key,
             'part': 'snippet',
             'videoId': video_id,
-            'maxResults': max_results,
+            'maxResults': min(limit, 100) if limit else 100,
             'order': 'time'
         }
+        deadline = time.monotonic() + time_budget if time_budget else None
+        yielded = 0
         
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        comments = []
-        for item in data.get('items', []):
-            comment_data = item['snippet']['topLevelComment']['snippet']
-            comment = {
-                'author': comment_data['authorDisplayName'],
-                'comment': comment_data['textDisplay'],
-                'date': comment_data['publishedAt'],
-                'likeCount': comment_data.get('likeCount', 0),
-                'authorProfileImageUrl': comment_data.get('authorProfileImageUrl', '')
-            }
-            comments.append(comment)
-        
-        return comments
+        while True:
+            data = self._get_json(url, params)
+            
+            for item in data.get('items', []):
+                comment_data = item['snippet']['topLevelComment']['snippet']
+                if published_after and comment_data['publishedAt'] <= published_after:
+                    return
+                
+                comment = {
+                    'id': item['snippet']['topLevelComment'].get('id', item.get('id')),
+                    'author': comment_data['authorDisplayName'],
+                    'comment': comment_data['textDisplay'],
+                    'date': comment_data['publishedAt'],
+                    'likeCount': comment_data.get('likeCount', 0),
+                    'authorProfileImageUrl': comment_data.get('authorProfileImageUrl', '')
+                }
+                yield comment
+                yielded += 1
+                if limit and yielded >= limit:
+                    return
+            
+            next_page_token = data.get('nextPageToken')
+            if not next_page_token or (deadline is not None and time.monotonic() >= deadline):
+                return
+            
+            params['pageToken'] = next_page_token
+            if limit:
+                params['maxResults'] = min(limit - yielded, 100)
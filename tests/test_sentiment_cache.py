@@ -0,0 +1,18 @@
+from textblob import TextBlob
+
+from services.comment_processor import SentimentService
+from services.sentiment_cache import SentimentMemo
+
+
+def test_memo_key_keeps_case_and_collapses_whitespace():
+    assert SentimentMemo.key("Great :D") != SentimentMemo.key("great :d")
+    assert SentimentMemo.key("Great  :D ") == SentimentMemo.key("Great :D")
+
+
+def test_scores_do_not_depend_on_which_case_was_scored_first():
+    # TextBlob scores these differently, as ":D" and ":d" are different emoticons
+    texts = ["great :d", "Great :D", "GREAT :D"]
+    service = SentimentService()
+    for text in texts + texts[::-1]:
+        polarity = service.analyze_batch([text])[0]['polarity']
+        assert abs(polarity - TextBlob(text).sentiment.polarity) <= 1e-9, text
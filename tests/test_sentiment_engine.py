@@ -0,0 +1,46 @@
+from services.sentiment_engine import PARITY_TOLERANCE, LexiconSentimentEngine, max_parity_error
+
+# Fixed corpus covering what TextBlob's PatternAnalyzer treats specially:
+# negations, intensifiers, exclamation marks, emoticons and mixed case
+CORPUS = [
+    "I love this car",
+    "I do not love this car",
+    "This is not bad at all",
+    "never good, never great",
+    "It isn't terrible",
+    "very good review",
+    "really very nice interior",
+    "extremely bad brakes",
+    "incredibly boring to drive",
+    "slightly disappointing range",
+    "Great video!",
+    "great video!!!",
+    "Awful road noise!!",
+    "best sedan ever :)",
+    "worst infotainment :(",
+    "nice handling :-) but ugly front end :-(",
+    "so happy ;) <3",
+    "GREAT review",
+    "Great Review",
+    "gReAt ReViEw",
+    "NOT BAD",
+    "Not Very Good!",
+    "what trim is this",
+    "first",
+    "",
+    "   ",
+    "12345",
+    "the the the",
+    "honestly the best and the worst car compared to my old one",
+    "I wouldn't say it is very, very good... but not awful either!",
+]
+
+
+def test_engine_matches_textblob_on_fixed_corpus():
+    assert max_parity_error(CORPUS) <= PARITY_TOLERANCE
+
+
+def test_fresh_engine_matches_textblob_one_text_at_a_time():
+    engine = LexiconSentimentEngine()
+    for text in CORPUS:
+        assert max_parity_error([text], engine) <= PARITY_TOLERANCE, text